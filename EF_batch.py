@@ -0,0 +1,223 @@
+import numpy as np
+
+from EF_of_dipole import const_k
+from EF_units import ANGLE_UNITS, unit_scale
+
+# * const_k as a plain float for vectorized arithmetic
+K = float(const_k)
+
+# * Largest a/r whose approx error is summed as a series, beyond it exact - approx loses under a digit
+ERROR_SERIES_RHO = 0.5
+
+
+def _potential_terms(r, cos_theta, a):
+    '''
+    Purpose: to calculate 1/r_1 - 1/r_2 for arrays without cancellation
+
+    Formula Used :
+
+            1/r_1 - 1/r_2 = (r_2^2 - r_1^2) / (r_1 * r_2 * (r_1 + r_2))
+                          = 4*a*r*Cos(theta) / (r_1 * r_2 * (r_1 + r_2))
+
+            r_1^2, r_2^2 = (r - a)^2 + 2*a*r*(1 -/+ Cos(theta))
+
+            r - a and 1 -/+ Cos(theta) are exact where they cancel, so r_1 and r_2 stay accurate
+            next to a charge, where r^2 + a^2 -/+ 2*a*r*Cos(theta) would be left with rounding noise.
+
+    Return: returns (r_1, r_2, 1/r_1 - 1/r_2)
+    '''
+    d_sq = (r - a)**2
+    u = 2*a*r
+    t = u*cos_theta
+    r_1 = np.sqrt(d_sq + u*(1 - cos_theta))
+    r_2 = np.sqrt(d_sq + u*(1 + cos_theta))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_diff = 2*t / (r_1 * r_2 * (r_1 + r_2))
+    return r_1, r_2, inv_diff
+
+
+def _cos_theta(theta, unit):
+    '''
+    Purpose: to calculate Cos(theta) rounded to 5 places exactly as dipole() does
+
+    Return: returns array of Cos(theta)
+    '''
+    theta = theta * unit_scale(unit, ANGLE_UNITS)
+    return np.round(np.cos(theta), 5)
+
+
+def approx_error_terms(r, cos_theta, a):
+    '''
+    Purpose      : To calculate (exact - approx) / (q*const_k) without cancellation, all arrays broadcast
+
+    Formula Used :
+
+            1/r_1 - 1/r_2 - 2*a*Cos(theta)/r^2 = 2/r * sum over odd l >= 3 of rho^l * P_l(Cos(theta))
+
+                   where,
+                        rho = a/r <= ERROR_SERIES_RHO
+                        (l+1)*P_(l+1) = (2l+1)*Cos(theta)*P_l - l*P_(l-1)
+
+            The dipole term cancels exactly, so nothing is lost however small rho is. Every point is
+            summed up to the order L with rho^(L+1) / (1 - rho^2) <= eps * rho^3. Elsewhere the
+            difference is formed directly, losing at most log10(1/rho^2) digits.
+
+    Return: returns float64 array with the broadcast shape
+    '''
+    r, cos_theta, a = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (r, cos_theta, a)))
+    shape = r.shape
+    r, cos_theta, a = (x.ravel() for x in (r, cos_theta, a))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = a / r
+        series = (rho <= ERROR_SERIES_RHO) & (r > 0)
+
+    values = np.empty_like(r)
+    if series.any():
+        idx = np.nonzero(series)[0]
+        rho, c = rho[idx], cos_theta[idx]
+        with np.errstate(divide='ignore'):
+            order = np.log(np.finfo(np.float64).eps * (1 - rho*rho)) / np.log(rho) + 2
+        order = np.fmax(np.nan_to_num(order, posinf=3.0), 3)
+
+        p_prev, p = np.ones_like(c), c
+        power = rho.copy()
+        total = np.zeros_like(rho)
+        l = 1
+        while idx.size:
+            p_prev, p = p, ((2*l + 1)*c*p - l*p_prev) / (l + 1)
+            power = power * rho
+            l += 1
+            if l % 2:
+                total = total + power * p
+                # Points whose tail is below eps are finished
+                done = order <= l
+                if done.any():
+                    values[idx[done]] = 2 / r[idx[done]] * total[done]
+                    keep = ~done
+                    idx, rho, c, order = idx[keep], rho[keep], c[keep], order[keep]
+                    p_prev, p, power, total = p_prev[keep], p[keep], power[keep], total[keep]
+
+    direct = ~series
+    if direct.any():
+        r_d, c_d, a_d = r[direct], cos_theta[direct], a[direct]
+        _, _, inv_diff = _potential_terms(r_d, c_d, a_d)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[direct] = inv_diff - 2*a_d*c_d / (r_d*r_d)
+
+    return values.reshape(shape)
+
+
+def dipole_moment_batch(charge, a):
+    '''
+    Purpose: to calculate the dipole moment for arrays of charge and a given in SI units
+
+    Return: returns float64 array of dipole moments
+    '''
+    charge = np.asarray(charge, dtype=np.float64)
+    a = np.asarray(a, dtype=np.float64)
+    return charge * 2 * a
+
+
+def dipole_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose      : To calculate exact potential, approx potential and their difference for whole arrays in one pass
+
+    Parameters   :
+                   a) r          - array of distances in meters
+                   b) theta      - array of angles in theta_unit
+                   c) charge     - array of charges in Coulomb
+                   d) a          - array of half separations in meters
+                   e) theta_unit - 'radians' or 'degrees'
+
+                   All arrays are broadcast against each other.
+                   The exact potential uses the cancellation-free form of 1/r_1 - 1/r_2
+                   so it stays accurate in float64 even when a << r. diff is not exact - approx,
+                   which would cancel down to noise there, but approx_error_terms().
+
+    Return: returns (exact, approx, diff) as float64 arrays
+    '''
+    r = np.asarray(r, dtype=np.float64)
+    a = np.asarray(a, dtype=np.float64)
+    charge = np.asarray(charge, dtype=np.float64)
+    cos_theta = _cos_theta(np.asarray(theta, dtype=np.float64), theta_unit)
+
+    kq = charge * K
+    _, _, inv_diff = _potential_terms(r, cos_theta, a)
+    exact = kq * inv_diff
+    approx = kq * 2 * a * cos_theta / (r*r)
+
+    return exact, approx, kq * approx_error_terms(r, cos_theta, a)
+
+
+def dipole_exact_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose: vectorized counterpart of dipole() for SI inputs
+
+    Return: returns float64 array of exact potentials
+    '''
+    r = np.asarray(r, dtype=np.float64)
+    a = np.asarray(a, dtype=np.float64)
+    charge = np.asarray(charge, dtype=np.float64)
+    cos_theta = _cos_theta(np.asarray(theta, dtype=np.float64), theta_unit)
+    _, _, inv_diff = _potential_terms(r, cos_theta, a)
+    return charge * K * inv_diff
+
+
+def dipole_approx_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose: vectorized counterpart of dipole_approx() for SI inputs
+
+    Return: returns float64 array of approx potentials
+    '''
+    r = np.asarray(r, dtype=np.float64)
+    a = np.asarray(a, dtype=np.float64)
+    charge = np.asarray(charge, dtype=np.float64)
+    cos_theta = _cos_theta(np.asarray(theta, dtype=np.float64), theta_unit)
+    return charge * K * 2 * a * cos_theta / (r*r)
+
+
+def approx_error_bound_batch(r, cos_theta, a):
+    '''
+    Purpose: vectorized counterpart of EF_of_dipole.approx_error_bound()
+
+    Return: returns float64 array of relative error bounds of the approx potential
+    '''
+    r, a = np.asarray(r, dtype=np.float64), np.asarray(a, dtype=np.float64)
+    cos_theta = np.abs(np.asarray(cos_theta, dtype=np.float64))
+
+    x_sq = (a / r)**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        e = x_sq * np.abs(5*cos_theta*cos_theta - 3) / 2 + x_sq*x_sq / ((1 - x_sq) * cos_theta)
+        bound = np.where(e < 1, e / (1 - e), np.inf)
+    bound = np.where(cos_theta == 0, 0.0, bound)
+    return np.where(r <= a, np.inf, bound)
+
+
+def dipole_auto_batch(r, theta, charge, a, rtol=1e-12, theta_unit='radians'):
+    '''
+    Purpose      : To calculate the potential for arrays with the cheapest formula meeting rtol at every point
+
+    Parameters   :
+                   a) r, theta, charge, a, theta_unit - as for dipole_batch()
+                   b) rtol                            - relative tolerance of the result
+
+                   The approx formula is used wherever approx_error_bound_batch() is within rtol,
+                   the cancellation-free exact formula is evaluated only at the remaining points.
+
+    Return: returns (values, exact_used, error_bound) where exact_used is a boolean array
+    '''
+    r, theta, charge, a = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (r, theta, charge, a)))
+    cos_theta = _cos_theta(theta, theta_unit)
+    kq = charge * K
+
+    bound = approx_error_bound_batch(r, cos_theta, a)
+    exact_used = bound > rtol
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = kq * 2 * a * cos_theta / (r*r)
+    if exact_used.any():
+        _, _, inv_diff = _potential_terms(r[exact_used], cos_theta[exact_used], a[exact_used])
+        values[exact_used] = kq[exact_used] * inv_diff
+
+    return values, exact_used, np.where(exact_used, rtol, bound)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class PotentialCache:
+    '''
+    Purpose: bounded LRU cache of exact potentials keyed on SI-normalized inputs and the precision setting
+
+    Usage        :
+                   cache = PotentialCache(maxsize=4096)
+                   dipole(r, theta, charge, a, cache=cache)
+                   cache.stats()  ->  {'hits': .., 'misses': .., 'evictions': .., 'size': .., 'maxsize': ..}
+    '''
+
+    def __init__(self, maxsize=1024):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(r, cos_theta, charge, a, rtol):
+        '''
+        Purpose: to build the cache key of one evaluation
+
+        Return: returns tuple of floats
+        '''
+        return (float(r), float(cos_theta), float(charge), float(a), float(rtol))
+
+    def get(self, key):
+        '''
+        Purpose: to look up a key, marking it as most recently used
+
+        Return: returns the stored value or None
+        '''
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        '''
+        Purpose: to store a value, evicting the least recently used entries when full
+        '''
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize):
+        '''
+        Purpose: to change the maximum size, evicting entries if it shrinks
+        '''
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''
+        Purpose: to drop every entry and reset the counters
+        '''
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        '''
+        Purpose: to report the cache counters
+
+        Return: returns dict of hits, misses, evictions, size and maxsize
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._data), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,208 @@
+'''
+Purpose: headless batch calculator, streams CSV or JSONL parameter sets through the vectorized core
+
+Usage  :
+         python EF_cli.py input.csv -o results.csv
+         cat input.jsonl | python EF_cli.py - --format jsonl > results.jsonl
+
+Input  : one row per calculation with the fields r, theta, q (or charge) and a. Each value is a compact
+         string like "3.2 nm", a number in SI units (theta in radians), or a number with a separate
+         <field>_unit column such as r_unit. JSONL values may also be [value, unit] lists.
+
+Output : every input field followed by moment, exact, approx and error. Rows are read, computed and
+         written chunk by chunk so memory stays flat regardless of the input size.
+
+This module never imports PyQt5.
+'''
+import argparse
+import csv
+import json
+import math
+import sys
+from itertools import islice
+
+import numpy as np
+
+from EF_batch import dipole_batch, dipole_approx_batch, dipole_moment_batch
+from EF_of_dipole import exact_potential, approx_error
+from EF_units import to_si, LENGTH_UNITS, CHARGE_UNITS, ANGLE_UNITS
+
+FIELDS = (('r', LENGTH_UNITS), ('theta', ANGLE_UNITS), ('q', CHARGE_UNITS), ('a', LENGTH_UNITS))
+RESULT_FIELDS = ('moment', 'exact', 'approx', 'error')
+CHUNK_ROWS = 10000
+
+
+def _quantity(row, name):
+    '''
+    Purpose: to read one field of a row as something to_si() understands
+
+    Return: returns (value, unit) tuple, compact string or number
+    '''
+    value = row.get(name)
+    if value is None and name == 'q':
+        value = row.get('charge')
+    if value is None or value == '':
+        raise ValueError('missing field %r' % name)
+
+    unit = row.get(name + '_unit') or (row.get('charge_unit') if name == 'q' else None)
+    if unit:
+        return float(value), unit
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def read_rows(stream, fmt):
+    '''
+    Purpose: to read input rows lazily
+
+    Return: yields dicts
+    '''
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _precise(function, row, rtol):
+    '''
+    Purpose: to evaluate exact_potential() or approx_error() for one row, a row sitting on a charge
+             gives inf instead of stopping the whole run
+
+    Return: returns float
+    '''
+    try:
+        value = function(*row, rtol=rtol)
+    except ArithmeticError:
+        return float('inf')
+    return float(value[0] if isinstance(value, tuple) else value)
+
+
+def compute_chunk(rows, rtol=None):
+    '''
+    Purpose: to normalize one chunk of rows and compute all results in one vectorized pass
+
+    Parameters   :
+                   a) rows - list of input dicts
+                   b) rtol - when given, exact values come from exact_potential() and errors from
+                             approx_error() with this tolerance instead of the float64 batch kernel
+
+    Return: returns dict of float64 arrays keyed by RESULT_FIELDS
+    '''
+    si = np.empty((4, len(rows)), dtype=np.float64)
+    for j, row in enumerate(rows):
+        for i, (name, units) in enumerate(FIELDS):
+            si[i, j] = to_si(_quantity(row, name), units)
+    r, theta, charge, a = si
+
+    if rtol is None:
+        exact, approx, error = dipole_batch(r, theta, charge, a)
+    else:
+        approx = dipole_approx_batch(r, theta, charge, a)
+        cos_theta = np.round(np.cos(theta), 5)
+        si_rows = list(zip(r.tolist(), cos_theta.tolist(), charge.tolist(), a.tolist()))
+        exact = np.array([_precise(exact_potential, row, rtol) for row in si_rows])
+        error = np.array([_precise(approx_error, row, rtol) for row in si_rows])
+
+    return {'moment': dipole_moment_batch(charge, a), 'exact': exact, 'approx': approx, 'error': error}
+
+
+class _CsvWriter:
+    '''
+    Purpose: to write result rows as CSV, the header is taken from the first row
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = None
+
+    def write(self, row):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.stream, fieldnames=list(row), extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow(row)
+
+
+class _JsonlWriter:
+    '''
+    Purpose: to write result rows as JSON lines, non-finite results are written as null
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        row = {key: None if isinstance(value, float) and not math.isfinite(value) else value
+               for key, value in row.items()}
+        self.stream.write(json.dumps(row, allow_nan=False))
+        self.stream.write('\n')
+
+
+def run(in_stream, out_stream, in_fmt, out_fmt, chunk_rows=CHUNK_ROWS, rtol=None):
+    '''
+    Purpose: to stream every row of in_stream through compute_chunk() into out_stream
+
+    Return: returns number of rows processed
+    '''
+    writer = _CsvWriter(out_stream) if out_fmt == 'csv' else _JsonlWriter(out_stream)
+    rows = read_rows(in_stream, in_fmt)
+    count = 0
+
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        try:
+            results = compute_chunk(chunk, rtol)
+        except (ValueError, TypeError) as error:
+            raise ValueError('rows %d-%d: %s' % (count + 1, count + len(chunk), error))
+
+        columns = [results[name].tolist() for name in RESULT_FIELDS]
+        for row, values in zip(chunk, zip(*columns)):
+            out = dict(row)
+            out.update(zip(RESULT_FIELDS, values))
+            writer.write(out)
+        out_stream.flush()
+        count += len(chunk)
+
+    return count
+
+
+def _guess_format(path):
+    '''
+    Purpose: to pick the format from the file extension, CSV unless it ends in .jsonl or .json
+    '''
+    return 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch dipole moment, exact potential, approx potential and error.')
+    parser.add_argument('input', help="input CSV or JSONL file, '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout (default)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='input format, guessed from the extension by default')
+    parser.add_argument('--output-format', choices=('csv', 'jsonl'), help='output format, same as input by default')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows computed per vectorized chunk')
+    parser.add_argument('--rtol', type=float, help='use exact_potential() with this relative tolerance for the exact value')
+    args = parser.parse_args(argv)
+
+    in_fmt = args.format or _guess_format(args.input)
+    out_fmt = args.output_format or (in_fmt if args.output == '-' else _guess_format(args.output))
+
+    in_stream = sys.stdin if args.input == '-' else open(args.input, newline='')
+    out_stream = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        run(in_stream, out_stream, in_fmt, out_fmt, args.chunk_rows, args.rtol)
+    except ValueError as error:
+        parser.exit(1, 'error: %s\n' % error)
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+'''
+Purpose: vectorized double-double arithmetic for the exact potential
+
+A double-double value is an unevaluated sum hi + lo of two float64 numbers with |lo| <= ulp(hi)/2,
+which carries about 32 significant digits. Every function takes and returns such (hi, lo) pairs
+of NumPy arrays (or plain floats) and broadcasts like ordinary NumPy arithmetic, so whole batches
+run at a small multiple of the float64 cost instead of going through mpmath point by point.
+
+Products use Dekker's splitting since NumPy has no fused multiply-add. Values beyond about 1e300
+overflow the splitting and values below about 1e-290 lose the low word to underflow.
+'''
+from math import sqrt
+
+import numpy as np
+from mpmath import mp
+
+from EF_batch import K, _cos_theta
+
+# * Points per block in dipole_dd_batch(), keeps the many temporaries in cache
+DD_CHUNK = 1 << 14
+
+# * Splitting constant of Dekker's product, 2^27 + 1
+_SPLIT = 134217729.0
+
+
+def _two_sum(a, b):
+    '''
+    Purpose: to add two floats exactly
+
+    Return: returns (s, err) with s = fl(a + b) and a + b = s + err
+    '''
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+
+def _quick_two_sum(a, b):
+    '''
+    Purpose: to add two floats exactly when |a| >= |b|
+
+    Return: returns (s, err) with s = fl(a + b) and a + b = s + err
+    '''
+    s = a + b
+    return s, b - (s - a)
+
+
+def _split(a):
+    '''
+    Purpose: to split a float into two halves of 26 significant bits each
+
+    Return: returns (hi, lo) with a = hi + lo
+    '''
+    t = _SPLIT * a
+    hi = t - (t - a)
+    return hi, a - hi
+
+
+def _two_prod(a, b):
+    '''
+    Purpose: to multiply two floats exactly
+
+    Return: returns (p, err) with p = fl(a * b) and a * b = p + err
+    '''
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(b)
+    return p, ((a_hi*b_hi - p) + a_hi*b_lo + a_lo*b_hi) + a_lo*b_lo
+
+
+def dd_add(a, b):
+    '''
+    Purpose: to add two double-double numbers
+
+    Return: returns (hi, lo)
+    '''
+    s, e = _two_sum(a[0], b[0])
+    t, f = _two_sum(a[1], b[1])
+    s, e = _quick_two_sum(s, e + t)
+    return _quick_two_sum(s, e + f)
+
+
+def dd_sub(a, b):
+    '''
+    Purpose: to subtract double-double b from a
+
+    Return: returns (hi, lo)
+    '''
+    return dd_add(a, (-b[0], -b[1]))
+
+
+def dd_mul(a, b):
+    '''
+    Purpose: to multiply two double-double numbers
+
+    Return: returns (hi, lo)
+    '''
+    p, e = _two_prod(a[0], b[0])
+    return _quick_two_sum(p, e + (a[0]*b[1] + a[1]*b[0]))
+
+
+def dd_div(a, b):
+    '''
+    Purpose: to divide double-double a by b with three steps of long division
+
+    Return: returns (hi, lo)
+    '''
+    q_1 = a[0] / b[0]
+    rem = dd_sub(a, dd_mul(b, (q_1, 0.0)))
+    q_2 = rem[0] / b[0]
+    rem = dd_sub(rem, dd_mul(b, (q_2, 0.0)))
+    q_3 = rem[0] / b[0]
+    q_1, q_2 = _quick_two_sum(q_1, q_2)
+    return dd_add((q_1, q_2), (q_3, 0.0))
+
+
+def dd_sqrt(a):
+    '''
+    Purpose      : To calculate the square root of a double-double number
+
+    Formula Used :
+
+            x = sqrt(hi) in float64, then one Newton step  sqrt(a) = x + (a - x^2) / (2*x)
+            with a - x^2 evaluated in double-double
+
+    Return: returns (hi, lo), zero for a = 0
+    '''
+    if isinstance(a[0], float):      # plain floats avoid the per-call overhead of NumPy scalars
+        x = sqrt(a[0])
+        rem = dd_sub(a, _two_prod(x, x))
+        return _quick_two_sum(x, rem[0] / (2*x) if x > 0 else 0.0)
+
+    x = np.sqrt(a[0])
+    rem = dd_sub(a, _two_prod(x, x))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = np.where(x > 0, rem[0] / (2*x), 0.0)
+    return _quick_two_sum(x, correction)
+
+
+def potential_dd(r, cos_theta, charge, a):
+    '''
+    Purpose      : To calculate the exact potential in double-double for values already in SI units
+
+    Formula Used :
+
+            (q*const_k) * 4*a*r*Cos(theta) / (r_1 * r_2 * (r_1 + r_2))
+
+                   where,
+                        r_1, r_2 = (r^2 + a^2 -/+ 2*a*r*Cos(theta))**0.5
+
+            The cancellation-free form keeps about 30 digits for a << r. r_1^2 and r_2^2 are
+            formed as (r - a)^2 + 2*a*r*(1 -/+ Cos(theta)) from exact differences, so nothing is
+            lost close to a charge either.
+
+    Parameters   : r, cos_theta, charge, a - float64 arrays broadcast against each other, or all Python floats
+
+    Return: returns (hi, lo) of the exact potential
+    '''
+    d = _two_sum(r, -a)
+    d_sq = dd_mul(d, d)
+    u = _two_prod(2*a, r)                                   # 2*a is exact
+    t = dd_mul(u, (cos_theta, 0.0))
+    r_1 = dd_sqrt(dd_add(d_sq, dd_mul(u, _two_sum(1.0, -cos_theta))))
+    r_2 = dd_sqrt(dd_add(d_sq, dd_mul(u, _two_sum(1.0, cos_theta))))
+
+    denominator = dd_mul(dd_mul(r_1, r_2), dd_add(r_1, r_2))
+    if isinstance(denominator[0], float):
+        inv_diff = dd_div((2*t[0], 2*t[1]), denominator)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_diff = dd_div((2*t[0], 2*t[1]), denominator)
+    return dd_mul(_two_prod(charge, K), inv_diff)
+
+
+def dipole_dd_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose: to calculate the exact potential in double-double for arrays, same inputs as EF_batch.dipole_batch()
+
+    Return: returns (hi, lo) float64 arrays, hi alone is the result rounded to float64
+    '''
+    r, theta, charge, a = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (r, theta, charge, a)))
+    shape = r.shape
+    r, charge, a = r.ravel(), charge.ravel(), a.ravel()
+    cos_theta = _cos_theta(theta.ravel(), theta_unit)
+
+    hi, lo = np.empty(r.size), np.empty(r.size)
+    for start in range(0, r.size, DD_CHUNK):
+        block = slice(start, start + DD_CHUNK)
+        hi[block], lo[block] = potential_dd(r[block], cos_theta[block], charge[block], a[block])
+    return hi.reshape(shape), lo.reshape(shape)
+
+
+def to_mpf(value):
+    '''
+    Purpose: to convert one scalar double-double value to an mpf without rounding
+
+    Return: returns mpf
+    '''
+    return mp.fadd(float(value[0]), float(value[1]), exact=True)
@@ -0,0 +1,117 @@
+import numpy as np
+
+from EF_batch import K, _potential_terms, _cos_theta
+from EF_units import DipoleInput, ANGLE_UNITS, unit_scale
+
+
+def _sin_theta(theta, unit):
+    '''
+    Purpose: to calculate Sin(theta) rounded to 5 places, matching _cos_theta()
+
+    Return: returns array of Sin(theta)
+    '''
+    theta = theta * unit_scale(unit, ANGLE_UNITS)
+    return np.round(np.sin(theta), 5)
+
+
+def field_terms(r, cos_theta, sin_theta, charge, a):
+    '''
+    Purpose      : To calculate exact potential and electric field together, sharing r_1, r_2 and 1/r_1 - 1/r_2
+
+    Formula Used :
+
+            V       = (q*const_k) * (1/r_1 - 1/r_2)
+            E_r     = (q*const_k) * ( r*(1/r_1^3 - 1/r_2^3) - a*Cos(theta)*(1/r_1^3 + 1/r_2^3) )
+            E_theta = (q*const_k) * a*Sin(theta)*(1/r_1^3 + 1/r_2^3)
+
+                   where,
+                        1/r_1^3 - 1/r_2^3 = (1/r_1 - 1/r_2) * (r_1^2 + r_1*r_2 + r_2^2) / (r_1^2 * r_2^2)
+
+                   so neither difference suffers from cancellation when a << r.
+
+    Return: returns (V, E_r, E_theta, |E|)
+    '''
+    kq = charge * K
+    r_1, r_2, inv_diff = _potential_terms(r, cos_theta, a)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_1_sq = r_1 * r_1
+        r_2_sq = r_2 * r_2
+        cube_sum = 1/(r_1_sq * r_1) + 1/(r_2_sq * r_2)
+        cube_diff = inv_diff * (r_1_sq + r_1*r_2 + r_2_sq) / (r_1_sq * r_2_sq)
+
+        E_r = kq * (r*cube_diff - a*cos_theta*cube_sum)
+        E_theta = kq * a*sin_theta*cube_sum
+
+    return kq * inv_diff, E_r, E_theta, np.hypot(E_r, E_theta)
+
+
+def field_approx_terms(r, cos_theta, sin_theta, charge, a):
+    '''
+    Purpose      : To calculate far-field potential and electric field of the point dipole p = q*2*a
+
+    Formula Used :
+
+            V       = const_k * p*Cos(theta) / r^2
+            E_r     = const_k * 2*p*Cos(theta) / r^3
+            E_theta = const_k * p*Sin(theta) / r^3
+
+    Return: returns (V, E_r, E_theta, |E|)
+    '''
+    kp = charge * K * 2*a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_r_sq = 1 / (r*r)
+        V = kp * cos_theta * inv_r_sq
+        E_r = 2 * kp * cos_theta * inv_r_sq / r
+        E_theta = kp * sin_theta * inv_r_sq / r
+    return V, E_r, E_theta, np.hypot(E_r, E_theta)
+
+
+def dipole_field(r, theta, charge, a):
+    '''
+    Purpose      : To calculate exact potential and electric field due to Dipole at one point
+
+    Parameters   :
+                   a) r      - distance between center of the dipole and point of observation
+                   b) theta  - Angle between positive charge and point of observation
+                   c) charge - either charge irrespective of sign
+                   d) a      - distance between either charge and center of dipole
+
+                   Each parameter is a (value, unit) tuple, a compact string like "3.2 nm" or a number in SI units
+
+    Return: returns (V, E_r, E_theta, |E|) as floats, E in volts per meter
+    '''
+    inp = DipoleInput(r, theta, charge, a)
+    return tuple(float(x) for x in field_terms(inp.r, inp.cos_theta, inp.sin_theta, inp.charge, inp.a))
+
+
+def dipole_field_approx(r, theta, charge, a):
+    '''
+    Purpose: To calculate far-field potential and electric field due to Dipole at one point
+
+    Return: returns (V, E_r, E_theta, |E|) as floats, E in volts per meter
+    '''
+    inp = DipoleInput(r, theta, charge, a)
+    return tuple(float(x) for x in field_approx_terms(inp.r, inp.cos_theta, inp.sin_theta, inp.charge, inp.a))
+
+
+def field_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose: vectorized counterpart of dipole_field() for SI inputs, arrays are broadcast against each other
+
+    Return: returns (V, E_r, E_theta, |E|) as float64 arrays
+    '''
+    theta = np.asarray(theta, dtype=np.float64)
+    return field_terms(np.asarray(r, dtype=np.float64), _cos_theta(theta, theta_unit), _sin_theta(theta, theta_unit),
+                       np.asarray(charge, dtype=np.float64), np.asarray(a, dtype=np.float64))
+
+
+def field_approx_batch(r, theta, charge, a, theta_unit='radians'):
+    '''
+    Purpose: vectorized counterpart of dipole_field_approx() for SI inputs
+
+    Return: returns (V, E_r, E_theta, |E|) as float64 arrays
+    '''
+    theta = np.asarray(theta, dtype=np.float64)
+    return field_approx_terms(np.asarray(r, dtype=np.float64), _cos_theta(theta, theta_unit), _sin_theta(theta, theta_unit),
+                              np.asarray(charge, dtype=np.float64), np.asarray(a, dtype=np.float64))
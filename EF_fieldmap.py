@@ -0,0 +1,122 @@
+from itertools import product
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from EF_batch import K, approx_error_terms
+from EF_units import to_si, LENGTH_UNITS, CHARGE_UNITS
+
+# * Largest number of grid points evaluated at once, bounds the working memory of a tile
+MAX_TILE_ELEMENTS = 1 << 18
+
+
+def iter_tiles(shape, max_elements=MAX_TILE_ELEMENTS):
+    '''
+    Purpose: to split a grid into row-major tiles of at most max_elements points
+
+    Return: yields tuples of slices, one slice per axis
+    '''
+    block = list(shape)
+    for axis in range(len(shape)):
+        rest = int(np.prod(shape[axis+1:], dtype=np.int64))
+        if rest <= max_elements:
+            block[axis] = max(1, min(shape[axis], max_elements // rest))
+            break
+        block[axis] = 1
+
+    starts = [range(0, n, b) for n, b in zip(shape, block)]
+    for corner in product(*starts):
+        yield tuple(slice(c, min(c + b, n)) for c, b, n in zip(corner, block, shape))
+
+
+def _axis_coords(extent, shape):
+    '''
+    Purpose: to build the coordinate vector of every axis of the grid
+
+    Return: returns list of float64 arrays
+    '''
+    return [np.linspace(lo, hi, n) for (lo, hi), n in zip(extent, shape)]
+
+
+def _tile_values(coords, tile, charge, a):
+    '''
+    Purpose      : To calculate exact potential and the error of the approx potential on one tile
+
+    Formula Used :
+
+            r_1^2 = (x - a)^2 + y^2 + z^2,  r_2^2 = (x + a)^2 + y^2 + z^2
+
+            exact  = (q*const_k) * 4*a*x / (r_1 * r_2 * (r_1 + r_2))
+            approx = (q*const_k) * 2*a*x / r^3
+
+            exact - approx comes from EF_batch.approx_error_terms() with Cos(theta) = x/r,
+            subtracting the two would leave only rounding noise far from the dipole.
+
+    Return: returns (exact, error) arrays with the shape of the tile
+    '''
+    axes = np.ix_(*[c[s] for c, s in zip(coords, tile)])
+    x = axes[0]
+    rest_sq = sum(axis * axis for axis in axes[1:])
+
+    r_sq = x*x + rest_sq
+    r_1 = np.sqrt((x - a)**2 + rest_sq)
+    r_2 = np.sqrt((x + a)**2 + rest_sq)
+
+    kq = charge * K
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exact = kq * 4*a*x / (r_1 * r_2 * (r_1 + r_2))
+        r = np.sqrt(r_sq)
+        error = kq * approx_error_terms(r, x / r, a)
+    error[r_sq == 0] = 0.0
+    return exact, error
+
+
+def potential_map(path, shape, extent, charge, a, error_path=None, max_elements=MAX_TILE_ELEMENTS, progress=None):
+    '''
+    Purpose      : To write the potential of a dipole over a 2D or 3D grid into a memory-mapped .npy file
+
+    Parameters   :
+                   a) path         - output .npy file of the exact potential
+                   b) shape        - (nx, ny) or (nx, ny, nz)
+                   c) extent       - ((x_min, x_max), (y_min, y_max)[, (z_min, z_max)]) in meters
+                   d) charge       - charge as (value, unit), compact string or Coulomb
+                   e) a            - distance between either charge and center of dipole
+                   f) error_path   - optional .npy file for diff(exact, approx) at every point
+                   g) max_elements - largest tile evaluated at once
+                   h) progress     - optional callable(done, total) called after every tile
+
+                   The dipole sits at the origin with the positive charge at x = +a.
+                   Memory use depends on max_elements only, never on the size of the grid.
+
+    Return: returns the memory-mapped exact potential (and error map when error_path is given)
+    '''
+    shape = tuple(int(n) for n in shape)
+    if len(shape) not in (2, 3) or len(extent) != len(shape):
+        raise ValueError('shape and extent must both be 2D or both be 3D')
+
+    charge = to_si(charge, CHARGE_UNITS)
+    a = to_si(a, LENGTH_UNITS)
+    coords = _axis_coords(extent, shape)
+
+    exact_map = open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+    error_map = None
+    if error_path is not None:
+        error_map = open_memmap(error_path, mode='w+', dtype=np.float64, shape=shape)
+
+    total = int(np.prod(shape, dtype=np.int64))
+    done = 0
+    for tile in iter_tiles(shape, max_elements):
+        exact, error = _tile_values(coords, tile, charge, a)
+        exact_map[tile] = exact
+        if error_map is not None:
+            error_map[tile] = error
+
+        done += exact.size
+        if progress is not None:
+            progress(done, total)
+
+    exact_map.flush()
+    if error_map is None:
+        return exact_map
+    error_map.flush()
+    return exact_map, error_map
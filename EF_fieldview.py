@@ -0,0 +1,428 @@
+'''
+Purpose: progressive heatmap of the potential or field magnitude around the dipole, with equipotential contours
+
+The plane z = 0 is split into square tiles aligned to a world grid, one grid per power-of-two zoom
+level, so panning and zooming within an octave reuse the tiles already computed. Newly exposed tiles
+are first evaluated on a coarse COARSE_SIZE grid in the GUI thread, then refined to TILE_SIZE samples
+per side on a background thread, nearest to the center first. Raw values are kept in a
+TileCache keyed on the dipole, the quantity and the tile, colors and contours are derived
+at paint time from the view.
+'''
+from collections import OrderedDict
+from math import floor, log2
+
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QComboBox
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QLineF, Qt, pyqtSignal
+from PyQt5 import QtGui
+
+from EF_batch import K
+from EF_field import field_terms
+
+# * Samples per side of a refined tile, and of the coarse first pass
+TILE_SIZE = 64
+COARSE_SIZE = 8
+
+# * Tiles kept by the default TileCache
+TILE_CACHE_SIZE = 4096
+
+# * Decades of the color scale, and contour spacing in screen pixels / number of contour levels
+DECADES = 4
+CONTOUR_STEP = 3
+CONTOUR_LEVELS = 8
+
+# * Quantities that can be displayed
+QUANTITIES = ('potential', 'field')
+
+
+def tile_values(quantity, level, i, j, size, charge, a):
+    '''
+    Purpose      : To evaluate one tile of the world grid
+
+    Formula Used :
+
+            The tile covers x in [i*w, (i+1)*w) and y in [j*w, (j+1)*w) with w = TILE_SIZE * 2^level meters,
+            sampled at the centers of a size x size grid. The dipole lies along the x axis with the
+            positive charge at x = +a, so r = (x^2 + y^2)**0.5, Cos(theta) = x/r and Sin(theta) = |y|/r.
+
+    Return: returns (size, size) float64 array, first row at the largest y
+    '''
+    w = TILE_SIZE * 2.0**level
+    steps = (np.arange(size) + 0.5) / size
+    x = (i + steps) * w
+    y = (j + 1 - steps) * w
+    x, y = np.meshgrid(x, y)
+
+    r = np.hypot(x, y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        V, _, _, E = field_terms(r, x / r, np.abs(y) / r, charge, a)
+    return V if quantity == 'potential' else E
+
+
+def normalize(values, quantity, charge, a, length):
+    '''
+    Purpose: to map values to [-1, 1] (potential) or [0, 1] (field) on a log scale of DECADES decades
+
+             The reference is the dipole approximation along the axis at distance length,
+             so the scale only changes with the view, not with the tiles that happen to be ready.
+
+    Return: returns float64 array, nan where values are nan
+    '''
+    p = 2 * a * charge * K
+    if quantity == 'potential':
+        reference = p / (length * length)
+        return np.sign(values) * np.minimum(np.log10(1 + np.abs(values) / reference) / DECADES, 1)
+    reference = p / length**3
+    with np.errstate(divide='ignore'):
+        return np.clip((np.log10(values / reference) + 1) / DECADES, 0, 1)
+
+
+def colorize(t, quantity):
+    '''
+    Purpose: to convert normalized values to RGB, blue-white-red for the potential, black-red-yellow-white for the field
+
+    Return: returns (..., 3) uint8 array, nan becomes grey
+    '''
+    nan = np.isnan(t)
+    t = np.where(nan, 0, t)
+    if quantity == 'potential':
+        pos, neg = np.clip(t, 0, 1), np.clip(-t, 0, 1)
+        rgb = np.stack([1 - neg, 1 - pos - neg, 1 - pos], axis=-1)
+    else:
+        rgb = np.clip(np.stack([3*t, 3*t - 1, 3*t - 2], axis=-1), 0, 1)
+    rgb[nan] = 0.5
+    return (rgb * 255).astype(np.uint8)
+
+
+# * Edges crossed in every marching-squares case, edges are 0 top, 1 right, 2 bottom, 3 left
+_CASES = {1: ((3, 2),), 2: ((2, 1),), 3: ((3, 1),), 4: ((0, 1),), 5: ((3, 0), (2, 1)), 6: ((0, 2),),
+          7: ((3, 0),), 8: ((3, 0),), 9: ((0, 2),), 10: ((3, 2), (0, 1)), 11: ((0, 1),), 12: ((3, 1),),
+          13: ((2, 1),), 14: ((3, 2),)}
+
+
+def contour_segments(grid, levels):
+    '''
+    Purpose: to find the contour lines of a 2D grid with marching squares
+
+    Parameters   :
+                   a) grid   - (rows, cols) array, cells with a nan corner are skipped
+                   b) levels - iterable of contour values
+
+    Return: returns (n, 4) float64 array of segments (x0, y0, x1, y1) in grid coordinates (column, row)
+    '''
+    tl, tr = grid[:-1, :-1], grid[:-1, 1:]
+    bl, br = grid[1:, :-1], grid[1:, 1:]
+    valid = ~(np.isnan(tl) | np.isnan(tr) | np.isnan(bl) | np.isnan(br))
+    rows, cols = np.mgrid[0:tl.shape[0], 0:tl.shape[1]]
+
+    segments = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for level in levels:
+            case = (8*(tl > level) + 4*(tr > level) + 2*(br > level) + (bl > level)) * valid
+            cells = np.nonzero((case > 0) & (case < 15))
+            if not cells[0].size:
+                continue
+            c = case[cells]
+            r0, c0 = rows[cells], cols[cells]
+            a, b, d, e = tl[cells], tr[cells], br[cells], bl[cells]
+
+            # Crossing point on every edge of the selected cells
+            points = (
+                (c0 + (level - a) / (b - a), r0),            # top
+                (c0 + 1, r0 + (level - b) / (d - b)),        # right
+                (c0 + (level - e) / (d - e), r0 + 1),        # bottom
+                (c0, r0 + (level - a) / (e - a)),            # left
+            )
+            for value, pairs in _CASES.items():
+                which = c == value
+                if not which.any():
+                    continue
+                for start, end in pairs:
+                    segments.append(np.column_stack([points[start][0][which], points[start][1][which],
+                                                     points[end][0][which], points[end][1][which]]))
+
+    if not segments:
+        return np.empty((0, 4))
+    return np.concatenate(segments)
+
+
+class TileCache:
+    '''
+    Purpose: bounded LRU store of tile values, only used from the GUI thread
+
+             Separate from EF_cache.PotentialCache so tiles neither evict cached potentials
+             nor show up in its hit and miss counts.
+    '''
+    def __init__(self, maxsize=TILE_CACHE_SIZE):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        '''
+        Purpose: to look up a tile, marking it as most recently used
+
+        Return: returns the values or None
+        '''
+        values = self._data.get(key)
+        if values is not None:
+            self._data.move_to_end(key)
+        return values
+
+    def put(self, key, values):
+        '''
+        Purpose: to store a tile, evicting the least recently used ones beyond maxsize
+        '''
+        self._data[key] = values
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class TileSignals(QObject):
+    '''
+    Purpose: signals posted by TileJob back to the GUI thread
+    '''
+    tile_ready = pyqtSignal(object, object)    # cache key, values
+
+
+class TileJob(QRunnable):
+    '''
+    Purpose: to refine a list of tiles on a QThreadPool thread, stopping once the view has moved on
+    '''
+    def __init__(self, view, generation, tiles):
+        super().__init__()
+        self.view = view
+        self.generation = generation
+        self.tiles = tiles
+        self.signals = TileSignals()
+
+    def run(self):
+        for key in self.tiles:
+            if self.view.generation != self.generation:
+                return
+            quantity, charge, a, level, i, j, size = key
+            self.signals.tile_ready.emit(key, tile_values(quantity, level, i, j, size, charge, a))
+
+
+class FieldMapView(QWidget):
+    '''
+    Purpose: widget drawing the tiles of the current view, drag to pan and use the wheel to zoom
+
+    Parameters   :
+                   a) cache - optional TileCache holding the tiles, a private one is made otherwise
+    '''
+    def __init__(self, parent=None, cache=None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else TileCache()
+        self.quantity = 'potential'
+        self.charge = None
+        self.a = None
+        self.center = (0.0, 0.0)
+        self.scale = 1.0           # meters per pixel
+        self.generation = 0
+        self.refining = 0
+        self._drag = None
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.setMinimumSize(200, 150)
+
+    def set_dipole(self, charge, a):
+        '''
+        Purpose: to show a new dipole (SI values), the view is reset to 16*a across when a changes
+        '''
+        if (charge, a) == (self.charge, self.a):
+            return
+        if a != self.a:
+            self.center = (0.0, 0.0)
+            self.scale = 16 * a / max(self.width(), 1)
+        self.charge, self.a = charge, a
+        self.refresh()
+
+    def set_quantity(self, quantity):
+        '''
+        Purpose: to switch between 'potential' and 'field'
+        '''
+        if quantity not in QUANTITIES:
+            raise ValueError('Unknown quantity %r' % quantity)
+        self.quantity = quantity
+        self.refresh()
+
+    def _level(self):
+        '''
+        Purpose: to find the zoom level whose samples are closest to, but not larger than, one pixel
+
+        Return: returns (level, tile width in meters)
+        '''
+        level = floor(log2(self.scale))
+        return level, TILE_SIZE * 2.0**level
+
+    def _visible_tiles(self):
+        '''
+        Purpose: to list the tiles overlapping the widget, nearest to the center first
+
+        Return: returns list of (level, i, j)
+        '''
+        level, w = self._level()
+        half_w, half_h = self.width() / 2 * self.scale, self.height() / 2 * self.scale
+        cx, cy = self.center
+        i_range = range(floor((cx - half_w) / w), floor((cx + half_w) / w) + 1)
+        j_range = range(floor((cy - half_h) / w), floor((cy + half_h) / w) + 1)
+        tiles = [(level, i, j) for i in i_range for j in j_range]
+        tiles.sort(key=lambda t: ((t[1] + 0.5) * w - cx)**2 + ((t[2] + 0.5) * w - cy)**2)
+        return tiles
+
+    def _key(self, level, i, j, size):
+        return (self.quantity, self.charge, self.a, level, i, j, size)
+
+    def refresh(self):
+        '''
+        Purpose: to fill the coarse tiles of the view now and queue the missing refined ones
+        '''
+        self.generation += 1
+        self.pool.clear()
+        if self.charge is None:
+            self.update()
+            return
+
+        refine = []
+        for level, i, j in self._visible_tiles():
+            if self.cache.get(self._key(level, i, j, TILE_SIZE)) is not None:
+                continue
+            coarse = self._key(level, i, j, COARSE_SIZE)
+            if self.cache.get(coarse) is None:
+                self.cache.put(coarse, tile_values(self.quantity, level, i, j, COARSE_SIZE, self.charge, self.a))
+            refine.append(self._key(level, i, j, TILE_SIZE))
+
+        self.refining = len(refine)
+        if refine:
+            job = TileJob(self, self.generation, refine)
+            job.signals.tile_ready.connect(self.tile_ready)
+            self.pool.start(job)
+        self.update()
+
+    def tile_ready(self, key, values):
+        '''
+        Purpose: to store a refined tile and repaint when it belongs to the current view
+        '''
+        self.cache.put(key, values)
+        if key[:3] == (self.quantity, self.charge, self.a) and key[3] == self._level()[0]:
+            self.refining = max(0, self.refining - 1)
+            self.update()
+
+    def compose(self):
+        '''
+        Purpose: to resample the best available tile of every visible position to screen pixels
+
+        Return: returns (height, width) float64 array, nan where no tile is ready
+        '''
+        width, height = self.width(), self.height()
+        out = np.full((height, width), np.nan)
+        if self.charge is None:
+            return out
+
+        level, w = self._level()
+        left = self.center[0] - width / 2 * self.scale
+        top = self.center[1] + height / 2 * self.scale
+        tile_px = w / self.scale
+
+        for level, i, j in self._visible_tiles():
+            values = self.cache.get(self._key(level, i, j, TILE_SIZE))
+            if values is None:
+                values = self.cache.get(self._key(level, i, j, COARSE_SIZE))
+            if values is None:
+                continue
+
+            x0 = (i * w - left) / self.scale
+            y0 = (top - (j + 1) * w) / self.scale
+            cols = np.arange(max(0, int(np.ceil(x0 - 0.5))), min(width, int(np.ceil(x0 + tile_px - 0.5))))
+            rows = np.arange(max(0, int(np.ceil(y0 - 0.5))), min(height, int(np.ceil(y0 + tile_px - 0.5))))
+            if not cols.size or not rows.size:
+                continue
+            size = values.shape[0]
+            ci = np.minimum(((cols + 0.5 - x0) / tile_px * size).astype(np.intp), size - 1)
+            ri = np.minimum(((rows + 0.5 - y0) / tile_px * size).astype(np.intp), size - 1)
+            out[np.ix_(rows, cols)] = values[np.ix_(ri, ci)]
+        return out
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        if self.charge is None:
+            painter.drawText(self.rect(), Qt.AlignCenter, 'Calculate a dipole to show its field map')
+            return
+
+        length = max(self.width(), self.height()) / 2 * self.scale
+        t = normalize(self.compose(), self.quantity, self.charge, self.a, length)
+        rgb = np.ascontiguousarray(colorize(t, self.quantity))
+        height, width = t.shape
+        image = QtGui.QImage(rgb.data, width, height, 3 * width, QtGui.QImage.Format_RGB888)
+        painter.drawImage(0, 0, image)
+
+        # Equipotential (or equal field) contours on a decimated copy of the normalized map
+        grid = t[::CONTOUR_STEP, ::CONTOUR_STEP]
+        if self.quantity == 'potential':
+            levels = np.linspace(-1, 1, 2*CONTOUR_LEVELS + 1)[1:-1]
+        else:
+            levels = np.linspace(0, 1, CONTOUR_LEVELS + 1)[1:-1]
+        segments = contour_segments(grid, levels) * CONTOUR_STEP
+        painter.setPen(QtGui.QPen(QtGui.QColor(40, 40, 40, 160), 1))
+        painter.drawLines([QLineF(x0, y0, x1, y1) for x0, y0, x1, y1 in segments.tolist()])
+
+        text = 'view %.3g m across' % (self.width() * self.scale)
+        if self.refining:
+            text += ' | refining %d tiles' % self.refining
+        painter.setPen(QtGui.QColor(0, 0, 0))
+        painter.drawText(8, self.height() - 8, text)
+
+    def resizeEvent(self, event):
+        self.refresh()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self._drag is None:
+            return
+        delta = event.pos() - self._drag
+        self._drag = event.pos()
+        self.center = (self.center[0] - delta.x() * self.scale, self.center[1] + delta.y() * self.scale)
+        self.refresh()
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def wheelEvent(self, event):
+        # Zooming around the cursor, the world point under it stays in place
+        factor = 1.25 ** (-event.angleDelta().y() / 120)
+        pos = event.pos()
+        dx = (pos.x() - self.width() / 2) * self.scale
+        dy = (self.height() / 2 - pos.y()) * self.scale
+        self.center = (self.center[0] + dx * (1 - factor), self.center[1] + dy * (1 - factor))
+        self.scale *= factor
+        self.refresh()
+
+
+class FieldMapWindow(QWidget):
+    '''
+    Purpose: MDI subwindow holding a quantity selector and the FieldMapView
+    '''
+    def __init__(self, parent=None, cache=None):
+        super().__init__(parent)
+        self.setWindowTitle('Field Map')
+        self.quantity_comboBox = QComboBox(self)
+        self.quantity_comboBox.addItems(['Potential', 'Field |E|'])
+        self.view = FieldMapView(self, cache)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.quantity_comboBox)
+        layout.addWidget(self.view)
+        self.quantity_comboBox.currentIndexChanged.connect(lambda index: self.view.set_quantity(QUANTITIES[index]))
@@ -0,0 +1,275 @@
+'''
+Purpose: vectorized inverse of the exact potential, finding r, theta or q that produces a target potential
+
+Usage  :
+         result = solve_r(V, theta, charge, a)        # also solve_theta(), solve_charge()
+         result.value[result.converged]
+
+All inputs are SI arrays broadcast against each other, like EF_batch.dipole_batch(). Every solver
+returns InverseResult(value, converged, solutions, alternative):
+
+         value       - the solution, nan where there is none
+         converged   - True where value meets rtol
+         solutions   - number of solutions, ANY where every value works (e.g. theta = 90 deg and target 0)
+         alternative - the second solution where solutions is 2, nan elsewhere
+
+The potential is evaluated with the cancellation-free form of EF_field.field_terms(), whose E_r
+gives the derivative in r. Unlike dipole(), Cos(theta) is not rounded to 5 places.
+'''
+from collections import namedtuple
+
+import numpy as np
+
+from EF_batch import K, _potential_terms
+from EF_field import field_terms
+from EF_of_dipole import FLOAT64_EPS
+from EF_units import ANGLE_UNITS, unit_scale
+
+# * Number of solutions meaning that every value solves the query
+ANY = -1
+
+# * Iteration limits of the safeguarded Newton iteration and of bracket searches
+MAX_ITER = 100
+MAX_DOUBLINGS = 200
+
+InverseResult = namedtuple('InverseResult', ['value', 'converged', 'solutions', 'alternative'])
+
+
+def _broadcast(*arrays):
+    '''
+    Purpose: to broadcast inputs to float64 arrays of one flat shape
+
+    Return: returns (shape, list of 1D arrays)
+    '''
+    arrays = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in arrays))
+    return arrays[0].shape, [x.ravel().copy() for x in arrays]
+
+
+def _cos(theta, theta_unit):
+    '''
+    Purpose: to get Cos(theta), values within rounding of 0 (e.g. Cos(pi/2) = 6e-17) are taken as exactly 0
+             so that theta = 90 deg gives a potential of 0 everywhere
+
+    Return: returns float64 array
+    '''
+    cos_theta = np.cos(theta * unit_scale(theta_unit, ANGLE_UNITS))
+    return np.where(np.abs(cos_theta) <= 4 * FLOAT64_EPS, 0.0, cos_theta)
+
+
+def _safeguarded_newton(func, lo, hi, target, rtol, max_iter=MAX_ITER):
+    '''
+    Purpose      : To solve func(x) = target for monotonic func on brackets [lo, hi], all points at once
+
+    Formula Used :
+
+            Newton step x - (f(x) - target) / f'(x), replaced by bisection whenever it leaves the
+            bracket. The bracket is shrunk with the sign of f(x) - target on every iteration,
+            so the iteration cannot diverge and converges quadratically once Newton steps are taken.
+            Points whose residual is down to rounding are done as well, which matters where f is
+            flat and x cannot reach rtol.
+
+    Parameters   :
+                   a) func   - callable(x, index) returning (f, f') for the points in index
+                   b) lo, hi - brackets with f(lo) - target and f(hi) - target of opposite sign
+
+    Return: returns (x, converged)
+    '''
+    x = 0.5 * (lo + hi)
+    converged = np.zeros(x.shape, dtype=bool)
+    active = np.arange(x.size)
+    lo, hi = lo.copy(), hi.copy()
+    lo_sign = np.sign(func(lo, active)[0] - target)
+
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        f, df = func(x[active], active)
+        residual = f - target[active]
+
+        # Shrinking the bracket around the root
+        same = np.sign(residual) == lo_sign[active]
+        lo[active[same]] = x[active[same]]
+        hi[active[~same]] = x[active[~same]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x[active] - residual / df
+        a_lo, a_hi = lo[active], hi[active]
+        inside = (step >= np.minimum(a_lo, a_hi)) & (step <= np.maximum(a_lo, a_hi))
+        new = np.where(inside, step, 0.5 * (a_lo + a_hi))
+        exact = np.abs(residual) <= 4 * FLOAT64_EPS * np.abs(target[active])
+        new = np.where(exact, x[active], new)
+
+        done = exact | (np.abs(new - x[active]) <= rtol * np.abs(new)) | (np.abs(a_hi - a_lo) <= rtol * np.abs(new))
+        x[active] = new
+        converged[active[done]] = True
+        active = active[~done]
+
+    return x, converged
+
+
+def solve_charge(target, r, theta, a, theta_unit='radians'):
+    '''
+    Purpose      : To find the charge producing a target potential, which is linear in q
+
+    Formula Used :
+
+            q = V / (const_k * (1/r_1 - 1/r_2))
+
+    Return: returns InverseResult, ANY solutions where 1/r_1 - 1/r_2 and the target are both 0
+    '''
+    shape, (target, r, theta, a) = _broadcast(target, r, theta, a)
+    cos_theta = _cos(theta, theta_unit)
+    _, _, inv_diff = _potential_terms(r, cos_theta, a)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = target / (K * inv_diff)
+    solvable = np.isfinite(value)
+    solutions = np.where(solvable, 1, np.where((inv_diff == 0) & (target == 0), ANY, 0))
+    value = np.where(solvable, value, np.nan)
+
+    return InverseResult(value.reshape(shape), solvable.reshape(shape), solutions.reshape(shape),
+                         np.full(shape, np.nan))
+
+
+def solve_theta(target, r, charge, a, theta_unit='radians', rtol=1e-13):
+    '''
+    Purpose      : To find the angle in [0, pi] producing a target potential
+
+    Formula Used :
+
+            V is strictly monotonic in c = Cos(theta) for charge != 0, since
+
+                dV/dc = (q*const_k) * a*r * (1/r_1^3 + 1/r_2^3)
+
+            so there is at most one solution, found between c = -1 and c = 1.
+
+    Return: returns InverseResult with theta in theta_unit
+    '''
+    shape, (target, r, charge, a) = _broadcast(target, r, charge, a)
+    kq = K * charge
+
+    def func(c, index):
+        r_1, r_2, inv_diff = _potential_terms(r[index], c, a[index])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derivative = kq[index] * a[index] * r[index] * (1/r_1**3 + 1/r_2**3)
+        return kq[index] * inv_diff, derivative
+
+    everything = np.arange(target.size)
+    v_low, _ = func(np.full(target.size, -1.0), everything)
+    v_high, _ = func(np.full(target.size, 1.0), everything)
+    solvable = (np.minimum(v_low, v_high) <= target) & (target <= np.maximum(v_low, v_high)) & (charge != 0)
+
+    c = np.full(target.size, np.nan)
+    converged = np.zeros(target.size, dtype=bool)
+    index = np.nonzero(solvable)[0]
+    if index.size:
+        sub = lambda x, i: func(x, index[i])
+        c[index], converged[index] = _safeguarded_newton(sub, np.full(index.size, -1.0), np.full(index.size, 1.0),
+                                                         target[index], rtol)
+
+    solutions = np.where(solvable, 1, np.where((charge == 0) & (target == 0), ANY, 0))
+    theta = np.arccos(np.clip(c, -1, 1)) / unit_scale(theta_unit, ANGLE_UNITS)
+    return InverseResult(theta.reshape(shape), converged.reshape(shape), solutions.reshape(shape),
+                         np.full(shape, np.nan))
+
+
+def _peak_radius(c, a, rtol):
+    '''
+    Purpose: to find the radius where V(r) peaks along the direction c > 0, i.e. where E_r changes sign
+
+             The bisection stops at rtol, but never below the 4*FLOAT64_EPS that float64 brackets
+             can resolve, and after MAX_ITER halvings at the latest.
+
+    Return: returns array of radii
+    '''
+    rtol = max(rtol, 4 * FLOAT64_EPS)
+    s = np.sqrt(1 - c*c)
+    lo = np.zeros_like(c)
+    hi = 2 * a
+
+    # Growing hi until the potential falls there (E_r > 0 means dV/dr < 0)
+    for _ in range(MAX_DOUBLINGS):
+        rising = field_terms(hi, c, s, 1.0, a)[1] <= 0
+        if not rising.any():
+            break
+        hi = np.where(rising, 2*hi, hi)
+
+    for _ in range(MAX_ITER):
+        mid = 0.5 * (lo + hi)
+        todo = hi - lo > rtol * mid
+        if not todo.any():
+            break
+        rising = field_terms(mid, c, s, 1.0, a)[1] <= 0
+        lo = np.where(todo & rising, mid, lo)
+        hi = np.where(todo & ~rising, mid, hi)
+    return 0.5 * (lo + hi)
+
+
+def solve_r(target, theta, charge, a, theta_unit='radians', rtol=1e-13):
+    '''
+    Purpose      : To find the distance producing a target potential
+
+    Formula Used :
+
+            Along a direction with Cos(theta) = c > 0 the potential rises from 0 at r = 0 to a peak
+            near r = a and falls back to 0 like 2*a*c/r^2, so targets between 0 and the peak have
+            two solutions, one on either side of the peak. c < 0 mirrors this with V(r, -c) = -V(r, c).
+            Both are refined by safeguarded Newton with dV/dr = -E_r.
+
+    Return: returns InverseResult with the solution beyond the peak as value (the far-field one,
+            r > a) and the one inside it as alternative
+    '''
+    shape, (target, theta, charge, a) = _broadcast(target, theta, charge, a)
+    cos_theta = _cos(theta, theta_unit)
+
+    # Mirroring c < 0 and negative charges onto c > 0 with a positive target
+    flip = np.sign(cos_theta) * np.sign(charge)
+    c = np.abs(cos_theta)
+    kq = K * np.abs(charge)
+    goal = target * flip
+
+    value = np.full(target.size, np.nan)
+    alternative = np.full(target.size, np.nan)
+    converged = np.zeros(target.size, dtype=bool)
+    solutions = np.where((flip == 0) & (target == 0), ANY, 0)
+
+    index = np.nonzero((flip != 0) & (goal > 0))[0]
+    if index.size:
+        ci, ai, kqi, gi = c[index], a[index], kq[index], goal[index]
+        si = np.sqrt(1 - ci*ci)
+
+        def func(r, i):
+            V, E_r, _, _ = field_terms(r, ci[i], si[i], kqi[i] / K, ai[i])
+            return V, -E_r
+
+        peak = _peak_radius(ci, ai, rtol)
+        with np.errstate(invalid='ignore'):
+            v_peak = func(peak, np.arange(index.size))[0]
+        v_peak = np.where(ci == 1, np.inf, v_peak)
+        reachable = gi <= v_peak
+
+        # Outer bracket [peak, far] with V(far) <= target
+        far = np.maximum(2 * peak, np.sqrt(2 * kqi * ai * ci / gi))
+        for _ in range(MAX_DOUBLINGS):
+            high = func(far, np.arange(index.size))[0] > gi
+            if not high.any():
+                break
+            far = np.where(high, 2*far, far)
+
+        sub = np.nonzero(reachable)[0]
+        if sub.size:
+            outer, ok_outer = _safeguarded_newton(lambda x, i: func(x, sub[i]), peak[sub], far[sub], gi[sub], rtol)
+            inner, ok_inner = _safeguarded_newton(lambda x, i: func(x, sub[i]), np.zeros(sub.size), peak[sub],
+                                                  gi[sub], rtol)
+            target_index = index[sub]
+            value[target_index] = outer
+            alternative[target_index] = inner
+            converged[target_index] = ok_outer & ok_inner
+
+            # Exactly at the peak both solutions coincide
+            single = gi[sub] == v_peak[sub]
+            solutions[target_index] = np.where(single, 1, 2)
+            alternative[target_index[single]] = np.nan
+
+    return InverseResult(value.reshape(shape), converged.reshape(shape), solutions.reshape(shape),
+                         alternative.reshape(shape))
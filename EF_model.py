@@ -0,0 +1,127 @@
+import numpy as np
+
+from EF_batch import K
+from EF_units import to_si, LENGTH_UNITS, CHARGE_UNITS, ANGLE_UNITS
+
+
+def _si(quantity, units):
+    '''
+    Purpose: to convert a scalar quantity or a whole array (already in SI units) for DipoleModel
+
+    Return: returns float for scalars, float64 array otherwise
+    '''
+    if isinstance(quantity, (tuple, list, str)):
+        return to_si(quantity, units)
+    if np.ndim(quantity):
+        return np.asarray(quantity, dtype=np.float64)
+    return float(quantity)
+
+
+class DipoleModel:
+    '''
+    Purpose: to evaluate one fixed dipole at many points, reusing every term that does not depend on the swept variable
+
+    Cached terms :
+                   a) charge*const_k and 2*a                        - recomputed only by set_charge() / set_a()
+                   b) r^2, (r - a)^2 and 2*a*r                      - recomputed only when r changes
+                   c) Cos(theta), 2*a*Cos(theta), 1 -/+ Cos(theta)  - recomputed only when theta changes
+
+                   Scalar r and theta are remembered between calls, so sweeping theta at a fixed r
+                   (or r at a fixed theta) only redoes the terms of the swept variable.
+                   Arrays are accepted for r and theta and are broadcast against each other.
+                   The exact potential uses the cancellation-free float64 form of 1/r_1 - 1/r_2, with
+                   r_1 and r_2 formed as in EF_batch._potential_terms() so they stay accurate next to a charge.
+    '''
+
+    def __init__(self, charge, a):
+        self.set_charge(charge)
+        self.set_a(a)
+
+    def set_charge(self, charge):
+        '''
+        Purpose: to change the charge, only charge*const_k is recomputed
+        '''
+        self.charge = to_si(charge, CHARGE_UNITS)
+        self.kq = self.charge * K
+
+    def set_a(self, a):
+        '''
+        Purpose: to change a, the cached r and theta terms depend on it and are dropped
+        '''
+        self.a = to_si(a, LENGTH_UNITS)
+        self.two_a = 2 * self.a
+        self._r_key = self._theta_key = None
+
+    def moment(self):
+        '''
+        Purpose: to calculate the dipole moment
+
+        Return: returns q*2*a in Coulomb meters
+        '''
+        return self.charge * self.two_a
+
+    def _r_terms(self, r):
+        '''
+        Purpose: to get r, r^2, (r - a)^2 and 2*a*r, reusing them when r did not change
+
+        Return: returns (r, r^2, (r - a)^2, 2*a*r)
+        '''
+        r = _si(r, LENGTH_UNITS)
+        if np.ndim(r):
+            return r, r * r, (r - self.a)**2, self.two_a * r
+
+        if self._r_key != r:
+            self._r_terms_cache = (r, r * r, (r - self.a)**2, self.two_a * r)
+            self._r_key = r
+        return self._r_terms_cache
+
+    def _theta_terms(self, theta):
+        '''
+        Purpose: to get Cos(theta) rounded to 5 places like dipole(), 2*a*Cos(theta) and 1 -/+ Cos(theta),
+                 reusing them when theta did not change
+
+        Return: returns (Cos(theta), 2*a*Cos(theta), 1 - Cos(theta), 1 + Cos(theta))
+        '''
+        theta = _si(theta, ANGLE_UNITS)
+        if np.ndim(theta):
+            cos_theta = np.round(np.cos(theta), 5)
+            return cos_theta, self.two_a * cos_theta, 1 - cos_theta, 1 + cos_theta
+
+        if self._theta_key != theta:
+            cos_theta = round(float(np.cos(theta)), 5)
+            self._theta_terms_cache = (cos_theta, self.two_a * cos_theta, 1 - cos_theta, 1 + cos_theta)
+            self._theta_key = theta
+        return self._theta_terms_cache
+
+    def potential(self, r, theta):
+        '''
+        Purpose: to calculate the exact potential at (r, theta)
+
+        Formula Used :
+
+                (q*const_k) * 4*a*r*Cos(theta) / (r_1 * r_2 * (r_1 + r_2))
+
+                   where,
+                        r_1^2, r_2^2 = (r - a)^2 + 2*a*r*(1 -/+ Cos(theta))
+
+        Return: returns exact potential
+        '''
+        r, _, d_sq, two_a_r = self._r_terms(r)
+        _, two_a_cos, minus, plus = self._theta_terms(theta)
+
+        t = two_a_cos * r
+        r_1 = np.sqrt(d_sq + two_a_r * minus)
+        r_2 = np.sqrt(d_sq + two_a_r * plus)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.kq * 2*t / (r_1 * r_2 * (r_1 + r_2))
+
+    def potential_approx(self, r, theta):
+        '''
+        Purpose: to calculate the approx potential q*2*a*Cos(theta)*const_k/(r**2) at (r, theta)
+
+        Return: returns approx potential
+        '''
+        _, r_sq, _, _ = self._r_terms(r)
+        _, two_a_cos, _, _ = self._theta_terms(theta)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.kq * two_a_cos / r_sq
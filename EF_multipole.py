@@ -0,0 +1,145 @@
+import numpy as np
+
+from EF_batch import K, _potential_terms, _cos_theta
+
+# * Highest Legendre order evaluated, points needing more use the closed form
+MAX_ORDER = 61
+
+# * Precomputed Legendre recurrence coefficients, (l+1)*P_(l+1) = (2l+1)*c*P_l - l*P_(l-1)
+_ALPHA = np.array([(2*l + 1) / (l + 1) for l in range(MAX_ORDER + 1)])
+_BETA = np.array([l / (l + 1) for l in range(MAX_ORDER + 1)])
+
+
+def _odd_ceil(order):
+    '''
+    Purpose: to round orders up to the next odd integer, at least 1
+
+    Return: returns int64 array
+    '''
+    order = np.fmax(np.ceil(order), 1).astype(np.int64)
+    return order + (order % 2 == 0)
+
+
+def choose_order(rho, cos_theta, rtol):
+    '''
+    Purpose      : To find the lowest odd order whose truncation error is within rtol of the leading term
+
+    Formula Used :
+
+            The series is sum over odd l of rho^l * P_l(Cos(theta)) with rho < 1 and |P_l| <= 1, so the
+            tail after order L relative to the leading term rho*|Cos(theta)| is at most
+
+                rho^(L+1) / ((1 - rho^2) * |Cos(theta)|)
+
+    Return: returns int64 array of orders, MAX_ORDER + 2 where the series converges too slowly
+            or not at all (rho >= 1, i.e. r = a)
+    '''
+    rho = np.asarray(rho, dtype=np.float64)
+    c = np.abs(np.asarray(cos_theta, dtype=np.float64))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        order = np.log(rtol * c * (1 - rho*rho)) / np.log(rho) - 1
+
+    # fmin maps the nan of rho = Cos(theta) = 0 to the closed form as well
+    order = np.where(rho < 1, order, MAX_ORDER + 2)
+    return _odd_ceil(np.fmin(order, MAX_ORDER + 2))
+
+
+def _legendre_series(rho, c, order):
+    '''
+    Purpose: to sum rho^l * P_l(c) over odd l, every point to at least its own order
+
+             Finished points are only split off once they are half of the remaining ones,
+             the others simply keep adding terms, which only makes them more accurate.
+
+    Return: returns (sums, orders actually used) as float64 and int64 arrays
+    '''
+    out = np.empty_like(rho)
+    used = np.empty(rho.shape, dtype=np.int64)
+    idx = np.arange(rho.size)
+    p_prev = np.ones_like(c)
+    p = c.copy()
+    power = rho.copy()
+    total = rho * c
+
+    l = 1
+    for l in range(1, int(order.max()) if order.size else 1):
+        # Splitting off finished points
+        if l % 2:
+            done = order[idx] <= l
+            n_done = np.count_nonzero(done)
+            if n_done and 2*n_done >= idx.size:
+                out[idx[done]] = total[done]
+                used[idx[done]] = l
+                keep = ~done
+                idx, c, rho = idx[keep], c[keep], rho[keep]
+                p_prev, p, power, total = p_prev[keep], p[keep], power[keep], total[keep]
+                if not idx.size:
+                    return out, used
+
+        p_prev, p = p, _ALPHA[l]*c*p - _BETA[l]*p_prev
+        power = power * rho
+        if (l + 1) % 2:
+            total = total + power * p
+
+    out[idx] = total
+    used[idx] = l + 1 if order.size and order.max() > 1 else 1
+    return out, used
+
+
+def multipole_potential(r, theta, charge, a, order=None, rtol=1e-12, theta_unit='radians'):
+    '''
+    Purpose      : To calculate the potential of the two-charge dipole from its Legendre multipole expansion
+
+    Formula Used :
+
+            (q*const_k) * 2/R * sum over odd l <= order of rho^l * P_l(Cos(theta))
+
+                   where,
+                        R   = max(r, a)
+                        rho = min(r, a) / R
+
+            order = 1 with r > a is dipole_approx(), every further odd order adds the next multipole
+            (octupole, ...). The even orders cancel between the two charges.
+
+    Parameters   :
+                   a) r, theta, charge, a, theta_unit - as for EF_batch.dipole_batch()
+                   b) order - fixed odd order for every point, None chooses it per point from rtol
+                   c) rtol  - target relative accuracy used when order is None
+
+                   With order None, points that would need more than MAX_ORDER terms (r close to a,
+                   or Cos(theta) close to 0) are evaluated with the closed form instead and get order 0.
+                   So are points with r = a, where the series does not converge, whatever the order.
+
+    Return: returns (potentials, orders used) as float64 and int64 arrays
+    '''
+    r, theta, charge, a = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (r, theta, charge, a)))
+    shape = r.shape
+    r, theta, charge, a = (x.ravel() for x in (r, theta, charge, a))
+    cos_theta = _cos_theta(theta, theta_unit)
+
+    R = np.maximum(r, a)
+    rho = np.minimum(r, a) / R
+
+    if order is None:
+        orders = choose_order(rho, cos_theta, rtol)
+    else:
+        orders = np.full(r.shape, _odd_ceil(order), dtype=np.int64)
+
+    series = (orders <= MAX_ORDER) & (rho < 1)
+    if series.all():
+        sums, orders = _legendre_series(rho, cos_theta, orders)
+        values = 2 * K * charge / R * sums
+        return values.reshape(shape), orders.reshape(shape)
+
+    values = np.empty_like(r)
+    if series.any():
+        sums, orders[series] = _legendre_series(rho[series], cos_theta[series], orders[series])
+        values[series] = 2 * K * charge[series] / R[series] * sums
+    if not series.all():
+        closed = ~series
+        _, _, inv_diff = _potential_terms(r[closed], cos_theta[closed], a[closed])
+        values[closed] = K * charge[closed] * inv_diff
+        orders[closed] = 0
+
+    return values.reshape(shape), orders.reshape(shape)
@@ -1,45 +1,52 @@
 from mpmath import mp
-from math import cos, radians
+from math import sqrt, log10, ceil
+from collections import namedtuple
+from time import perf_counter
 
-# * Initializing accuracy level and value of const_k
-mp.dps = 100
+import EF_profile
+from EF_units import DipoleInput, to_si, LENGTH_UNITS, CHARGE_UNITS
+
+# * Initializing value of const_k
 const_k = mp.fmul(8.9875518, 10**9)
 
+# * Default relative tolerance of the exact potential and precision planner settings
+DEFAULT_RTOL = 1e-12
+FLOAT64_EPS = 2.0**-52
+DD_EPS = 2.0**-104
+GUARD_DPS = 5
+
+# * Largest number of times approx_error() redoes the difference with a better cancellation estimate
+MAX_REFINE = 4
+
+PrecisionPlan = namedtuple('PrecisionPlan', ['path', 'dps', 'lost_digits'])
+AutoResult = namedtuple('AutoResult', ['value', 'branch', 'error_bound'])
+
 def dipole_moment(charge, a):
     '''
     Purpose: to calculate the value of dipole moment
 
+    Parameters: charge and a, each as (value, unit), a compact string like "5 uC" or a number in SI units
+
     Return: returns dipole moment calculated
     '''
-    # Editing Value of charge as per the unit
-
-    if charge[1] in ('Coulomb', 'C'):
-        charge = charge[0]
-    elif charge[1] in ('microCoulomb', 'uC'):
-        charge = mp.fmul(charge[0], 10**(-6) )
-    elif charge[1] in ('milliCoulomb', 'mC'):
-        charge = mp.fmul(charge[0], 10**(-3) )
-    elif charge[1] in ('electronCharge', 'eC'):
-        charge = mp.fmul(charge[0], mp.fmul(1.60217646, mp.fmul(10, -19) ) )                                             # 1.60217646⋅10-19
-    elif charge[1] in ('nanoCoulomb', 'nC'):
-        charge = mp.fmul(charge[0], mp.power(10, -10) )
-    elif charge[1] in ('picoCoulomb', 'pC'):
-        charge = mp.fmul( charge[0], mp.power(10, -12) )
-
-    # Editing value of a as per the unit
-    if a[1].lower() in ('meters', 'm'):
-        a = a[0]
-    elif a[1].lower() in ('centimeters', 'cm'):
-        a = mp.fmul(a[0], 10**(-2) )
-    elif a[1].lower() in ('millimeters', 'mm'):
-        a = mp.fmul(a[0], 10**(-3) )
-    elif a[1].lower() in ('angstroms', 'a', 'A'):
-        a = mp.fmul(a[0], 10**(-10) )
-
-    return mp.fmul(charge, mp.fmul(2, a))
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('dipole_moment')
+        t = perf_counter()
+
+    # Converting charge and a to SI units
+    charge = to_si(charge, CHARGE_UNITS)
+    a = to_si(a, LENGTH_UNITS)
+    if prof is not None:
+        t = prof.lap('units', t)
+
+    result = mp.fmul(charge, mp.fmul(2, a))
+    if prof is not None:
+        prof.lap('moment', t)
+    return result
 
 
-def dipole(r, theta, charge, a):
+def dipole(r, theta, charge, a, rtol=DEFAULT_RTOL, cache=None):
     '''
     Purpose      : To calculate Electric Potential due to Dipole considering very small values
 
@@ -60,62 +67,182 @@ def dipole(r, theta, charge, a):
                    b) theta  - Angle between positive charge and point of observation
                    c) charge - either charge irrespective of sign
                    d) a      - distance between either charge and center of dipole
+                   e) rtol   - relative tolerance used by plan_precision() to pick the evaluation path
+                   f) cache  - optional EF_cache.PotentialCache to reuse earlier results
+
+                   r, theta, charge and a are (value, unit) tuples, compact strings like "3.2 nm" or numbers in SI units
 
     Return: returns exact value of electric field calculated
     '''
 
 
-    # Editing value of r as per the unit
-    if r[1].lower() in ('meters', 'm'):
-        r = r[0]
-    elif r[1].lower() in ('centimeters', 'cm'):
-        r = mp.fmul(r[0], 10**(-2) )
-    elif r[1].lower() in ('millimeters', 'mm'):
-        r = mp.fmul(r[0], 10**(-3) )
-    elif r[1].lower() in ('angstroms', 'a', 'A'):
-        r = mp.fmul(r[0], 10**(-10) )
-
-    # Editing value of a as per the unit
-    if a[1].lower() in ('meters', 'm'):
-        a = a[0]
-    elif a[1].lower() in ('centimeters', 'cm'):
-        a = mp.fmul(a[0], 10**(-2) )
-    elif a[1].lower() in ('millimeters', 'mm'):
-        a = mp.fmul(a[0], 10**(-3) )
-    elif a[1].lower() in ('angstroms', 'a', 'A'):
-        a = mp.fmul(a[0], 10**(-10) )
-
-    # Calculating Value of Cos(theta)
-    if theta[1].lower() == 'radians':
-        cos_theta = round( mp.cos(theta[0]), 5 )
-    elif theta[1].lower() == 'degrees':
-        cos_theta = round( mp.cos(mp.radians(theta[0])), 5 )
-
-    # Editing Value of charge as per the unit
-    if charge[1] in ('Coulomb', 'C'):
-        charge = charge[0]
-    elif charge[1] in ('microCoulomb', 'uC'):
-        charge = mp.fmul(charge[0], 10**(-6) )
-    elif charge[1] in ('milliCoulomb', 'mC'):
-        charge = mp.fmul(charge[0], 10**(-3) )
-    elif charge[1] in ('electronCharge', 'eC'):
-        charge = mp.fmul(charge[0], mp.fmul(1.60217646, mp.fmul(10, -19) ) )                                         # 1.60217646⋅10-19
-    elif charge[1] in ('nanoCoulomb', 'nC'):
-        charge = mp.fmul(charge[0], mp.power(10, -10) )
-    elif charge[1] in ('picoCharge', 'pC'):
-        charge = mp.fmul( charge[0], mp.power(10, -12) )
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('dipole')
+
+    # Converting all the inputs to SI units, DipoleInput records the 'units' and 'cos' stages
+    inp = DipoleInput(r, theta, charge, a)
+
+    # Calculating final result with the cheapest path meeting rtol
+    result, _ = exact_potential(inp.r, inp.cos_theta, inp.charge, inp.a, rtol, cache)
+
+    # returning final result
+    return result
+
+
+def _distances(r, cos_theta, a):
+    '''
+    Purpose      : To calculate r_1 and r_2 in float64 without cancellation next to a charge
+
+    Formula Used :
+
+            r_1^2, r_2^2 = (r - a)^2 + 2*a*r*(1 -/+ Cos(theta))
+
+            r - a and 1 -/+ Cos(theta) are exact where they cancel, unlike r^2 + a^2 -/+ 2*a*r*Cos(theta)
+
+    Return: returns (r_1, r_2) as floats
+    '''
+    d_sq = (r - a)**2
+    u = 2*a*r
+    return sqrt(d_sq + u*(1 - cos_theta)), sqrt(d_sq + u*(1 + cos_theta))
+
+
+def plan_precision(r, cos_theta, a, rtol=DEFAULT_RTOL):
+    '''
+    Purpose      : To choose the cheapest way of evaluating 1/r_1 - 1/r_2 within a relative tolerance
+
+    Paths        :
+                   a) 'float64' - direct formula in float64, used when the cancellation is mild
+                   b) 'rewrite' - cancellation-free form 4*a*r*Cos(theta) / (r_1*r_2*(r_1 + r_2)) in float64
+                   c) 'ddouble' - cancellation-free form in double-double (EF_ddouble), about 30 digits
+                   d) 'mpmath'  - direct formula in mpmath with just enough dps
+
+                   The digits lost by the subtraction are estimated from
+                   (1/r_1) / |1/r_1 - 1/r_2|, r_1 being the distance to the nearer charge,
+                   which grows like r / (2*a*Cos(theta)) when a << r. The float64 and double-double
+                   paths take r_1 and r_2 from _distances(), which stays accurate next to a charge.
+                   'mpmath' forms r_1^2 = s - t directly and also loses the log10(s / r_1^2) digits
+                   of that subtraction, with s = r^2 + a^2.
+
+    Return: returns PrecisionPlan(path, dps, lost_digits), dps is None for the float64 and double-double paths
+    '''
+    r, cos_theta, a = float(r), float(cos_theta), float(a)
+
+    r_1, r_2 = _distances(r, abs(cos_theta), a)
+    t = abs(2*a*r*cos_theta)
+
+    if t == 0 or r_1 == 0:
+        lost_digits = 0.0
+    else:
+        lost_digits = log10(r_2 * (r_1 + r_2) / (2*t))
+
+    if 4 * FLOAT64_EPS * 10**lost_digits <= rtol:
+        return PrecisionPlan('float64', None, lost_digits)
+    if 8 * FLOAT64_EPS <= rtol:
+        return PrecisionPlan('rewrite', None, lost_digits)
+    if 64 * DD_EPS <= rtol:
+        return PrecisionPlan('ddouble', None, lost_digits)
+
+    near_digits = log10((r*r + a*a) / (r_1*r_1)) if r_1 > 0 else 0.0
+    dps = int(ceil(-log10(rtol) + lost_digits + near_digits)) + GUARD_DPS
+    return PrecisionPlan('mpmath', dps, lost_digits + near_digits)
+
+
+def exact_potential(r, cos_theta, charge, a, rtol=DEFAULT_RTOL, cache=None):
+    '''
+    Purpose      : To calculate exact Electric Potential due to Dipole for values already in SI units
+
+    Parameters   :
+                   a) r         - distance in meters
+                   b) cos_theta - Cos(theta)
+                   c) charge    - charge in Coulomb
+                   d) a         - half separation in meters
+                   e) rtol      - requested relative tolerance of the result
+                   f) cache     - optional EF_cache.PotentialCache to reuse earlier results
+
+    Return: returns (exact potential, PrecisionPlan used)
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('exact_potential')
+
+    if cache is None:
+        return _exact_potential(r, cos_theta, charge, a, rtol)
+
+    key = cache.key(r, cos_theta, charge, a, rtol)
+    result = cache.get(key)
+    if result is None:
+        result = _exact_potential(r, cos_theta, charge, a, rtol)
+        cache.put(key, result)
+    return result
+
+
+def potential_mp(r, cos_theta, charge, a):
+    '''
+    Purpose: To calculate exact potential with the direct formula at the current mp.dps, values in SI units
+
+    Return: returns exact potential as mpf
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        t = perf_counter()
+
+    r, cos_theta, a = mp.mpf(r), mp.mpf(cos_theta), mp.mpf(a)
 
     # Calculating value of r_1 and r_2
     r_1 = mp.sqrt(mp.fsub(mp.fadd(mp.power(r, 2), mp.power(a, 2)), mp.fmul(2, mp.fmul(a, mp.fmul(r, cos_theta)))))
     r_2 = mp.sqrt(mp.fadd(mp.fadd(mp.power(r, 2), mp.power(a, 2)), mp.fmul(2, mp.fmul(a, mp.fmul(r, cos_theta)))))
+    if prof is not None:
+        t = prof.lap('sqrt', t)
 
-    # Calculating final result
     result = mp.fmul(mp.fmul(charge, const_k), mp.fsub(mp.fdiv(1, r_1), mp.fdiv(1, r_2)))
-
-    # returning final result
+    if prof is not None:
+        prof.lap('subtract', t)
     return result
 
 
+def _exact_potential(r, cos_theta, charge, a, rtol):
+    '''
+    Purpose: uncached body of exact_potential()
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        start = perf_counter()
+
+    plan = plan_precision(r, cos_theta, a, rtol)
+    if prof is not None:
+        start = prof.lap('plan', start)
+        prof.plan(plan)
+
+    if plan.path == 'mpmath':
+        with mp.workdps(plan.dps):
+            result = potential_mp(r, cos_theta, charge, a)
+        return result, plan
+
+    if plan.path == 'ddouble':
+        from EF_ddouble import potential_dd, to_mpf     # EF_ddouble imports this module
+        result = to_mpf(potential_dd(float(r), float(cos_theta), float(charge), float(a)))
+        if prof is not None:
+            prof.lap('ddouble', start)
+        return result, plan
+
+    r, cos_theta, a = float(r), float(cos_theta), float(a)
+    t = 2*a*r*cos_theta
+    r_1, r_2 = _distances(r, cos_theta, a)
+    if prof is not None:
+        start = prof.lap('sqrt', start)
+
+    if plan.path == 'float64':
+        inv_diff = 1/r_1 - 1/r_2
+    else:
+        inv_diff = 2*t / (r_1 * r_2 * (r_1 + r_2))
+
+    result = mp.mpf(float(charge) * float(const_k) * inv_diff)
+    if prof is not None:
+        prof.lap('subtract', start)
+    return result, plan
+
+
 def dipole_approx(r, theta, charge, a):
     '''
     Purpose      : To calculate Electric Potential due to Dipole neglecting very small value of a^2
@@ -132,60 +259,157 @@ def dipole_approx(r, theta, charge, a):
                    c) charge - either charge irrespective of sign
                    d) a      - distance between either charge and center of dipole
 
+                   Each parameter is a (value, unit) tuple, a compact string like "3.2 nm" or a number in SI units
+
     Return : returns approx electric field calculated
     '''
 
 
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('dipole_approx')
+
+    # Converting all the inputs to SI units, DipoleInput records the 'units' and 'cos' stages
+    inp = DipoleInput(r, theta, charge, a)
+
+    # returning final result
+    return approx_potential(inp.r, inp.cos_theta, inp.charge, inp.a)
+
+
+def approx_potential(r, cos_theta, charge, a):
     '''
-    Editing Values of the arguments as per the values received by this function
-    '''
-    # Editing value of r as per the unit
-    if r[1].lower() in ('meters', 'm'):
-        r = r[0]
-    elif r[1].lower() in ('centimeters', 'cm'):
-        r = mp.fmul(r[0], 10**(-2) )
-    elif r[1].lower() in ('millimeters', 'mm'):
-        r = mp.fmul(r[0], 10**(-3) )
-    elif r[1].lower() in ('angstroms', 'a', 'A'):
-        r = mp.fmul(r[0], 10**(-10) )
-
-    # Editing value of a as per the unit
-    if a[1].lower() in ('meters', 'm'):
-        a = a[0]
-    elif a[1].lower() in ('centimeters', 'cm'):
-        a = mp.fmul(a[0], 10**(-2) )
-    elif a[1].lower() in ('millimeters', 'mm'):
-        a = mp.fmul(a[0], 10**(-3) )
-    elif a[1].lower() in ('angstroms', 'a', 'A'):
-        a = mp.fmul(a[0], 10**(-10) )
-
-    # Calculating Value of Cos(theta)
-    if theta[1].lower() == 'radians':
-        cos_theta = round( cos(theta[0]), 5 )
-    elif theta[1].lower() == 'degrees':
-        cos_theta = round( cos(mp.radians(theta[0])), 5 )
-
-    # Editing Value of charge as per the unit
-    if charge[1] in ('Coulomb', 'C'):
-        charge = charge[0]
-    elif charge[1] in ('microCoulomb', 'uC'):
-        charge = mp.fmul(charge[0], 10**(-6) )
-    elif charge[1] in ('milliCoulomb', 'mC'):
-        charge = mp.fmul(charge[0], 10**(-3) )
-    elif charge[1] in ('electronCharge', 'eC'):
-        charge = mp.fmul(charge[0], mp.fmul(1.60217646, mp.fmul(10, -19) ) )                                         # 1.60217646⋅10-19
-    elif charge[1] in ('nanoCoulomb', 'nC'):
-        charge = mp.fmul(charge[0], mp.power(10, -10) )
-    elif charge[1] in ('picoCharge', 'pC'):
-        charge = mp.fmul( charge[0], mp.power(10, -12) )
+    Purpose: To calculate approx Electric Potential due to Dipole for values already in SI units
+
+    Return : returns approx potential calculated
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        t = perf_counter()
 
     # Applying Formula to given parameters
     result = mp.fdiv(mp.fmul(const_k, mp.fmul(charge, mp.fmul(2, mp.fmul(a, cos_theta)))), mp.power(r,2))
+    if prof is not None:
+        prof.lap('approx', t)
 
     # returning final result
     return result
 
 
+def approx_error_bound(r, cos_theta, a):
+    '''
+    Purpose      : To bound the relative error of dipole_approx() against dipole() without evaluating dipole()
+
+    Formula Used :
+
+            For r > a the exact potential is the odd Legendre series
+
+                (q*const_k) * 2 * sum over odd l of  a^l / r^(l+1) * P_l(Cos(theta))
+
+            and dipole_approx() is its l = 1 term. With x = a/r and |P_l| <= 1 for l >= 5,
+
+                |exact - approx| / |approx| <= e = x^2*|5*Cos(theta)^2 - 3|/2 + x^4 / ((1 - x^2)*|Cos(theta)|)
+
+            and relative to the exact value the error is at most e / (1 - e).
+
+    Return: returns the bound, 0 when Cos(theta) = 0 (both values are exactly 0), inf when r <= a
+    '''
+    r, cos_theta, a = float(r), abs(float(cos_theta)), float(a)
+    if r <= a:
+        return float('inf')
+    if cos_theta == 0:
+        return 0.0
+
+    x_sq = (a / r)**2
+    e = x_sq * abs(5*cos_theta*cos_theta - 3) / 2 + x_sq*x_sq / ((1 - x_sq) * cos_theta)
+    return e / (1 - e) if e < 1 else float('inf')
+
+
+def dipole_auto(r, theta, charge, a, rtol=DEFAULT_RTOL, cache=None):
+    '''
+    Purpose      : To calculate the potential with the cheapest formula that meets rtol
+
+    Parameters   :
+                   a) r, theta, charge, a - as for dipole()
+                   b) rtol                - relative tolerance of the result
+                   c) cache               - optional EF_cache.PotentialCache used by the exact branch
+
+                   dipole_approx()'s formula is used when approx_error_bound() is within rtol,
+                   otherwise the exact formula through exact_potential().
+
+    Return: returns AutoResult(value, branch, error_bound), branch is 'approx' or 'exact'
+    '''
+    inp = DipoleInput(r, theta, charge, a)
+
+    bound = approx_error_bound(inp.r, inp.cos_theta, inp.a)
+    if bound <= rtol:
+        return AutoResult(approx_potential(inp.r, inp.cos_theta, inp.charge, inp.a), 'approx', bound)
+
+    value, _ = exact_potential(inp.r, inp.cos_theta, inp.charge, inp.a, rtol, cache)
+    return AutoResult(value, 'exact', rtol)
+
+
+def approx_error(r, cos_theta, charge, a, rtol=DEFAULT_RTOL, cache=None):
+    '''
+    Purpose      : To calculate exact - approx potential to a relative tolerance of the difference itself
+
+    Formula Used :
+
+            When a << r the two potentials agree to about log10(|exact| / |exact - approx|) digits,
+            so the exact potential is planned with rtol * scale, scale being the expected
+            |exact - approx| / |exact| from approx_error_bound(), and the difference is formed with
+            as many digits. A difference smaller than expected (e.g. close to a root of P_3) is
+            redone with scale taken from the result, at most MAX_REFINE times.
+
+    Parameters   :
+                   a) r, cos_theta, charge, a - values in SI units as for exact_potential()
+                   b) rtol                    - relative tolerance of the difference
+                   c) cache                   - optional EF_cache.PotentialCache passed to exact_potential()
+
+    Return: returns exact - approx as mpf
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('approx_error')
+
+    if float(cos_theta) == 0:
+        return mp.mpf(0)
+
+    scale = min(approx_error_bound(r, cos_theta, a), 1.0) / 10
+    for _ in range(MAX_REFINE):
+        with mp.workdps(int(ceil(-log10(rtol * scale))) + GUARD_DPS):
+            EP, _ = exact_potential(r, cos_theta, charge, a, rtol * scale, cache)
+            error = mp.fsub(EP, approx_potential(r, cos_theta, charge, a))
+            if error == 0 or abs(error / EP) >= scale:
+                break
+            scale = float(abs(error / EP)) / 10
+    return +error
+
+
+def evaluate(inp, rtol=DEFAULT_RTOL, cache=None):
+    '''
+    Purpose: to calculate every result shown by the calculator from one normalized input
+
+    Parameters   :
+                   a) inp   - DipoleInput holding r, theta, charge and a in SI units
+                   b) rtol  - relative tolerance of the exact potential and of the error
+                   c) cache - optional EF_cache.PotentialCache to reuse earlier results
+
+    Return: returns (dipole moment, exact potential, approx potential, error), error from approx_error()
+    '''
+    prof = EF_profile.active
+    if prof is not None:
+        prof.call('evaluate')
+        t = perf_counter()
+
+    DM = mp.fmul(inp.charge, mp.fmul(2, inp.a))
+    if prof is not None:
+        prof.lap('moment', t)
+
+    EP, _ = exact_potential(inp.r, inp.cos_theta, inp.charge, inp.a, rtol, cache)
+    AP = approx_potential(inp.r, inp.cos_theta, inp.charge, inp.a)
+    return DM, EP, AP, approx_error(inp.r, inp.cos_theta, inp.charge, inp.a, rtol, cache)
+
+
 def diff(EP:float, AP:float):
     '''
     Purpose: to calculate the difference between the exact and approx value
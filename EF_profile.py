@@ -0,0 +1,142 @@
+'''
+Purpose: opt-in instrumentation of the calculator entry points
+
+Usage  :
+         with EF_profile.profiling() as recorder:
+             dipole(r, theta, charge, a)
+         recorder.snapshot()
+
+         EF_profile.enable() / EF_profile.disable() / EF_profile.snapshot() do the same without a with block.
+
+Instrumented code checks EF_profile.active before reading the clock, so the only cost while
+disabled is one attribute lookup per stage.
+'''
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+# * Recorder collecting timings, None while instrumentation is disabled
+active = None
+
+
+class Recorder:
+    '''
+    Purpose: to collect call counts of entry points, wall time of stages and chosen precision paths
+    '''
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.stage_calls = defaultdict(int)
+        self.stage_seconds = defaultdict(float)
+        self.precision = defaultdict(int)
+        self._lock = Lock()
+
+    def call(self, entry):
+        '''
+        Purpose: to count one call of an entry point
+        '''
+        with self._lock:
+            self.calls[entry] += 1
+
+    def lap(self, stage, start):
+        '''
+        Purpose: to add the time since start to a stage
+
+        Return: returns the current clock, to be used as start of the next stage
+        '''
+        now = perf_counter()
+        with self._lock:
+            self.stage_calls[stage] += 1
+            self.stage_seconds[stage] += now - start
+        return now
+
+    def plan(self, plan):
+        '''
+        Purpose: to count the precision path chosen by plan_precision()
+        '''
+        key = plan.path if plan.dps is None else '%s@%d' % (plan.path, plan.dps)
+        with self._lock:
+            self.precision[key] += 1
+
+    def snapshot(self):
+        '''
+        Purpose: to copy the collected data
+
+        Return: returns dict with 'calls', 'stages' ({stage: {'calls', 'seconds'}}) and 'precision'
+        '''
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'stages': {stage: {'calls': self.stage_calls[stage], 'seconds': self.stage_seconds[stage]}
+                           for stage in self.stage_calls},
+                'precision': dict(self.precision),
+            }
+
+    def reset(self):
+        '''
+        Purpose: to drop everything collected so far
+        '''
+        with self._lock:
+            self.calls.clear()
+            self.stage_calls.clear()
+            self.stage_seconds.clear()
+            self.precision.clear()
+
+    def summary(self):
+        '''
+        Purpose: to format the stages and precision paths on one line, e.g. for a status bar
+
+        Return: returns string
+        '''
+        data = self.snapshot()
+        parts = ['%s %.1f us' % (stage, values['seconds'] * 1e6) for stage, values in data['stages'].items()]
+        if data['precision']:
+            parts.append('path ' + ', '.join(data['precision']))
+        return ' | '.join(parts)
+
+
+def enable():
+    '''
+    Purpose: to start recording into a fresh Recorder
+
+    Return: returns the Recorder
+    '''
+    global active
+    active = Recorder()
+    return active
+
+
+def disable():
+    '''
+    Purpose: to stop recording
+
+    Return: returns the Recorder that was active, or None
+    '''
+    global active
+    recorder, active = active, None
+    return recorder
+
+
+def snapshot():
+    '''
+    Purpose: to copy the data of the active Recorder
+
+    Return: returns dict like Recorder.snapshot(), or None when disabled
+    '''
+    recorder = active
+    return None if recorder is None else recorder.snapshot()
+
+
+@contextmanager
+def profiling():
+    '''
+    Purpose: to record only inside a with block, the previous state is restored afterwards
+    '''
+    global active
+    previous = active
+    recorder = enable()
+    try:
+        yield recorder
+    finally:
+        active = previous
@@ -0,0 +1,357 @@
+'''
+Purpose: local asyncio HTTP/JSON service for moment, exact potential, approx potential and error
+
+Usage  :
+         python EF_server.py --port 8765
+
+         POST /evaluate   {"r": "1 m", "theta": "30 deg", "q": "1 uC", "a": "1 A"}     -> all four results
+         POST /moment, /potential, /approx, /error                                      -> that result only
+         GET  /stats                                                                    -> batching counters
+
+         Values are compact strings, [value, unit] lists or SI numbers (theta in radians).
+         An optional "rtol" below float64 precision sends the exact potential, approx potential
+         and error to the worker process pool, those results come back as strings to keep every
+         digit. Results that are not finite, e.g. at a charge, are null.
+
+Requests arriving within --window-ms are coalesced into one vectorized dipole_batch() call and
+identical requests in flight share one result. When more than --max-pending distinct requests are
+waiting the server answers 503 instead of queueing more work.
+'''
+import argparse
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from mpmath import mp
+
+from EF_batch import dipole_batch
+from EF_of_dipole import exact_potential, approx_potential, approx_error, FLOAT64_EPS
+from EF_units import to_si, LENGTH_UNITS, CHARGE_UNITS, ANGLE_UNITS
+
+ENDPOINTS = {'/evaluate': None, '/moment': 'moment', '/potential': 'exact', '/approx': 'approx', '/error': 'error'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           503: 'Service Unavailable'}
+
+# * Largest request body accepted, larger ones are answered with 413
+MAX_BODY = 1 << 16
+
+# * Tolerances at or above this are met by the float64 batch kernel
+BATCH_RTOL = 8 * FLOAT64_EPS
+
+
+class Overloaded(Exception):
+    '''
+    Purpose: raised by MicroBatcher.submit() when too many requests are waiting
+    '''
+
+
+class BadRequest(Exception):
+    '''
+    Purpose: raised by Server._read_request() for a request that cannot be parsed, carries the status to answer
+    '''
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize(body):
+    '''
+    Purpose: to convert a request body to the SI key used for batching and deduplication
+
+    Return: returns (r, theta, charge, a, rtol), rtol is None for the float64 kernel
+    '''
+    def quantity(name, units):
+        value = body.get(name)
+        if value is None and name == 'q':
+            value = body.get('charge')
+        if value is None:
+            raise ValueError('missing field %r' % name)
+        return to_si(tuple(value) if isinstance(value, list) else value, units)
+
+    rtol = body.get('rtol')
+    rtol = None if rtol is None or float(rtol) >= BATCH_RTOL else float(rtol)
+    return (quantity('r', LENGTH_UNITS), quantity('theta', ANGLE_UNITS),
+            quantity('q', CHARGE_UNITS), quantity('a', LENGTH_UNITS), rtol)
+
+
+def _json_number(value):
+    '''
+    Purpose: to map a float64 result to JSON, which has no nan or infinities
+
+    Return: returns float, or None where value is not finite
+    '''
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _evaluate_precise(rows):
+    '''
+    Purpose: to calculate exact potentials below float64 precision inside a worker process
+
+             The approx potential is evaluated at the precision of the exact one and the error
+             comes from approx_error() with the same rtol, subtracting the float64 approx would
+             only leave its rounding error.
+
+    Parameters: rows of (r, theta, charge, a, rtol)
+
+    Return: returns list of (exact potential, approx potential, error) as strings, None where not finite
+    '''
+    def text(value, digits):
+        return mp.nstr(value, digits) if mp.isfinite(value) else None
+
+    results = []
+    for r, theta, charge, a, rtol in rows:
+        cos_theta = round(float(np.cos(theta)), 5)
+        try:
+            value, plan = exact_potential(r, cos_theta, charge, a, rtol)
+        except ZeroDivisionError:        # at a charge
+            value, plan = mp.inf, None
+        digits = 17 if plan is None else plan.dps or (32 if plan.path == 'ddouble' else 17)
+        with mp.workdps(digits):
+            approx = approx_potential(r, cos_theta, charge, a)
+            error = approx_error(r, cos_theta, charge, a, rtol) if mp.isfinite(value) else value
+            results.append((text(value, digits), text(approx, digits), text(error, digits)))
+    return results
+
+
+class MicroBatcher:
+    '''
+    Purpose: to coalesce concurrent requests into vectorized batches and deduplicate identical ones
+
+    Parameters   :
+                   a) window      - seconds to wait for more requests after the first one of a batch
+                   b) max_batch   - batch size that triggers an immediate flush
+                   c) max_pending - distinct requests allowed to wait or run before submit() raises Overloaded
+                   d) executor    - process pool for requests with rtol below float64 precision
+    '''
+
+    def __init__(self, window=0.002, max_batch=4096, max_pending=10000, executor=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.executor = executor
+        self._inflight = {}
+        self._queue = []
+        self._timer = None
+        self._tasks = set()    # running _run_precise() tasks, the loop itself only keeps weak references
+        self.stats = {'requests': 0, 'deduplicated': 0, 'batches': 0, 'batched_rows': 0, 'rejected': 0}
+
+    async def submit(self, key):
+        '''
+        Purpose: to get the results of one normalized request
+
+        Return: returns dict with moment, exact, approx and error
+        '''
+        self.stats['requests'] += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+            return await asyncio.shield(future)
+
+        if len(self._inflight) >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise Overloaded()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        self._queue.append(key)
+
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        '''
+        Purpose: to compute everything queued so far in one vectorized pass
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._queue = self._queue, []
+        if not keys:
+            return
+
+        self.stats['batches'] += 1
+        self.stats['batched_rows'] += len(keys)
+
+        r, theta, charge, a = np.array([key[:4] for key in keys], dtype=np.float64).T
+        exact, approx, error = dipole_batch(r, theta, charge, a)
+        moment = charge * 2 * a
+
+        precise = []
+        for i, key in enumerate(keys):
+            result = {'moment': _json_number(moment[i]), 'exact': _json_number(exact[i]),
+                      'approx': _json_number(approx[i]), 'error': _json_number(error[i])}
+            if key[4] is None:
+                self._resolve(key, result)
+            else:
+                precise.append((key, result))
+
+        if precise:
+            task = asyncio.ensure_future(self._run_precise(precise))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_precise(self, precise):
+        '''
+        Purpose: to replace the float64 results of high-precision requests with worker results
+        '''
+        keys = [key for key, _ in precise]
+        loop = asyncio.get_running_loop()
+        try:
+            values = await loop.run_in_executor(self.executor, _evaluate_precise, keys)
+        except Exception as error:
+            for key in keys:
+                future = self._inflight.pop(key)
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (key, result), (exact, approx, error) in zip(precise, values):
+            result['exact'] = exact
+            result['approx'] = approx
+            result['error'] = error
+            self._resolve(key, result)
+
+    def _resolve(self, key, result):
+        future = self._inflight.pop(key)
+        if not future.done():
+            future.set_result(result)
+
+
+class Server:
+    '''
+    Purpose: minimal HTTP/1.1 front end of MicroBatcher, connections are kept alive
+    '''
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as error:
+                    self._write_response(writer, error.status, {'error': str(error)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                status, payload = await self._dispatch(method, path, body)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        '''
+        Purpose: to read one request
+
+        Return: returns (method, path, body bytes, keep alive) or None at end of stream,
+                raises BadRequest for a malformed request line or Content-Length and a body over MAX_BODY
+        '''
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode('latin-1').split()
+        except ValueError:
+            raise BadRequest(400, 'malformed request line')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest(400, 'malformed Content-Length')
+        if length < 0:
+            raise BadRequest(400, 'malformed Content-Length')
+        if length > MAX_BODY:
+            raise BadRequest(413, 'body larger than %d bytes' % MAX_BODY)
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method, path, body, keep_alive
+
+    async def _dispatch(self, method, path, body):
+        '''
+        Purpose: to route one request
+
+        Return: returns (status code, JSON-serializable payload)
+        '''
+        if path == '/stats' and method == 'GET':
+            return 200, dict(self.batcher.stats, pending=len(self.batcher._inflight))
+        if path not in ENDPOINTS:
+            return 404, {'error': 'unknown endpoint'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+
+        try:
+            key = normalize(json.loads(body or b'{}'))
+        except (ValueError, TypeError, AttributeError) as error:
+            return 400, {'error': str(error)}
+
+        try:
+            result = await self.batcher.submit(key)
+        except Overloaded:
+            return 503, {'error': 'overloaded, retry later'}
+
+        field = ENDPOINTS[path]
+        return 200, (result if field is None else {field: result[field]})
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode()
+        head = ['HTTP/1.1 %d %s' % (status, REASONS[status]),
+                'Content-Type: application/json',
+                'Content-Length: %d' % len(data),
+                'Connection: %s' % ('keep-alive' if keep_alive else 'close')]
+        if status == 503:
+            head.append('Retry-After: 1')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + data)
+
+
+async def serve(host, port, window, max_batch, max_pending, workers):
+    '''
+    Purpose: to run the server until cancelled
+    '''
+    with ProcessPoolExecutor(workers) as executor:
+        batcher = MicroBatcher(window, max_batch, max_pending, executor)
+        server = await asyncio.start_server(Server(batcher).handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON service of the dipole calculator.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--window-ms', type=float, default=2.0, help='coalescing window in milliseconds')
+    parser.add_argument('--max-batch', type=int, default=4096, help='rows that trigger an immediate batch')
+    parser.add_argument('--max-pending', type=int, default=10000, help='distinct requests allowed in flight')
+    parser.add_argument('--workers', type=int, help='processes for high-precision requests')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.window_ms / 1000, args.max_batch, args.max_pending, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+'''
+Purpose: persistent on-disk store of exact potentials, shared across processes and sessions
+
+Usage  :
+         store = ResultStore('results.sqlite')
+         values = store.get_many(rows, 'dps=100')         # None where nothing is stored yet
+         store.put_many(rows, values, 'dps=100')
+
+         SweepExecutor(store=store).run(points)          # only computes what is missing
+
+Rows are SI (r, cos_theta, charge, a) tuples as produced by EF_units.DipoleInput. Every value is
+keyed on those four floats, FORMULA_VERSION and a precision string, so results of an older formula
+or of another precision are never returned. Values are stored as the exact mantissa and exponent of
+the mpf and come back with the precision of their key, not that of the current mp context.
+
+The database runs in WAL mode, so any number of processes may read while one writes; writers wait
+up to timeout seconds for each other. Every process and thread opens its own connection on first
+use, a ResultStore can be passed to worker processes, only its path is pickled.
+'''
+import os
+import sqlite3
+import threading
+
+from mpmath import mp
+from mpmath.libmp import from_man_exp
+
+# * Version of the exact potential formulas, bump it when their results change
+FORMULA_VERSION = 1
+
+# * Rows per statement of bulk lookups and inserts
+STORE_CHUNK = 10000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS potential (
+    version   INTEGER NOT NULL,
+    precision TEXT    NOT NULL,
+    r         REAL    NOT NULL,
+    cos_theta REAL    NOT NULL,
+    charge    REAL    NOT NULL,
+    a         REAL    NOT NULL,
+    mantissa  TEXT    NOT NULL,
+    exponent  INTEGER,
+    PRIMARY KEY (version, precision, r, cos_theta, charge, a)
+) WITHOUT ROWID
+'''
+
+
+def precision_key(dps=None, rtol=None):
+    '''
+    Purpose: to build the precision part of the key, rtol takes priority over dps
+
+    Return: returns string such as 'dps=100' or 'rtol=1e-30'
+    '''
+    if rtol is not None:
+        return 'rtol=%r' % float(rtol)
+    return 'dps=%d' % (dps or mp.dps)
+
+
+def _encode(value):
+    '''
+    Purpose: to convert an mpf to (signed mantissa text, exponent) without rounding
+
+    Return: returns tuple, exponent is None for nan and infinities
+    '''
+    if not isinstance(value, mp.mpf):
+        value = mp.mpf(value)
+    if not mp.isfinite(value):
+        return str(value), None
+    sign, man, exp, _ = value._mpf_
+    return str(-man if sign else man), exp
+
+
+def _decode(mantissa, exponent, precision):
+    '''
+    Purpose: to rebuild the mpf stored by _encode() at the precision of its key
+
+             'dps=N' values are rounded to N digits, which leaves them as they were computed.
+             'rtol=...' values were computed at whatever precision the planner chose and are
+             rebuilt bit for bit.
+
+    Return: returns mpf
+    '''
+    if exponent is None:
+        return mp.mpf(mantissa)
+    value = mp.make_mpf(from_man_exp(int(mantissa), exponent))
+    if precision.startswith('dps='):
+        with mp.workdps(int(precision[4:])):
+            return +value
+    return value
+
+
+class ResultStore:
+    '''
+    Purpose: SQLite store of exact potentials with bulk lookup and insert
+
+    Parameters   :
+                   a) path    - database file, created when missing
+                   b) timeout - seconds a writer waits for the lock held by another process
+    '''
+
+    def __init__(self, path, timeout=30.0):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._connection()
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.path, self.timeout = state['path'], state['timeout']
+        self.hits = self.misses = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        '''
+        Purpose: to get the connection of the current process and thread, opening it on first use
+
+        Return: returns sqlite3.Connection
+        '''
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(_SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def get_many(self, rows, precision):
+        '''
+        Purpose: to look up a batch of SI rows
+
+        Parameters   :
+                   a) rows      - sequence of (r, cos_theta, charge, a)
+                   b) precision - string from precision_key()
+
+        Return: returns list with the stored mpf or None for every row, in the order of rows
+        '''
+        rows = [tuple(float(x) for x in row) for row in rows]
+        found = {}
+        connection = self._connection()
+        for start in range(0, len(rows), STORE_CHUNK):
+            chunk = rows[start:start + STORE_CHUNK]
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (r REAL, cos_theta REAL, charge REAL, a REAL)')
+            connection.execute('BEGIN')
+            try:
+                connection.execute('DELETE FROM wanted')
+                connection.executemany('INSERT INTO wanted VALUES (?, ?, ?, ?)', chunk)
+                cursor = connection.execute(
+                    'SELECT p.r, p.cos_theta, p.charge, p.a, p.mantissa, p.exponent FROM wanted AS w '
+                    'JOIN potential AS p ON p.version = ? AND p.precision = ? AND p.r = w.r '
+                    'AND p.cos_theta = w.cos_theta AND p.charge = w.charge AND p.a = w.a',
+                    (FORMULA_VERSION, precision))
+                for r, cos_theta, charge, a, mantissa, exponent in cursor:
+                    found[(r, cos_theta, charge, a)] = _decode(mantissa, exponent, precision)
+            finally:
+                connection.execute('COMMIT')
+
+        values = [found.get(row) for row in rows]
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def put_many(self, rows, values, precision):
+        '''
+        Purpose: to store a batch of results, rows already present are kept unchanged
+
+        Parameters   :
+                   a) rows      - sequence of (r, cos_theta, charge, a)
+                   b) values    - exact potentials (mpf or anything mp.mpf() accepts) in the order of rows
+                   c) precision - string from precision_key()
+        '''
+        records = [(FORMULA_VERSION, precision) + tuple(float(x) for x in row) + _encode(value)
+                   for row, value in zip(rows, values)]
+        connection = self._connection()
+        for start in range(0, len(records), STORE_CHUNK):
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany('INSERT OR IGNORE INTO potential VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                       records[start:start + STORE_CHUNK])
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    def stats(self):
+        '''
+        Purpose: to report lookups of this instance and the number of stored rows
+
+        Return: returns dict with 'hits', 'misses' and 'size'
+        '''
+        size = self._connection().execute('SELECT COUNT(*) FROM potential').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'size': size}
+
+    def close(self):
+        '''
+        Purpose: to close the connection of the current thread
+        '''
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid():
+            local.connection.close()
+            del local.connection, local.pid
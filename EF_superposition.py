@@ -0,0 +1,203 @@
+import numpy as np
+
+from EF_batch import K
+
+# * Largest number of (target, dipole) pairs evaluated at once by direct summation
+MAX_PAIRS = 1 << 20
+
+# * Problems with at most this many (target, dipole) pairs use direct summation in 'auto' mode,
+# * benchmarks/bench_superposition.py puts the crossover near 1e5 pairs (e.g. 200 targets x 1000 dipoles)
+DIRECT_LIMIT = 1 << 17
+
+
+def _pair_potential(dx, dy, dz, nx, ny, nz, charge, a):
+    '''
+    Purpose: to calculate the potential of dipoles at offsets d, using the cancellation-free form
+
+    Formula Used :
+
+            r_1, r_2 = |d -/+ a*n|
+            (q*const_k) * 4*a*(n.d) / (r_1 * r_2 * (r_1 + r_2))
+
+            r_1 and r_2 are the norms of the offsets from each charge rather than
+            (|d|^2 + a^2 -/+ 2*a*(n.d))**0.5, which cancels next to a charge
+
+    Return: returns array of potentials
+    '''
+    ax, ay, az = a*nx, a*ny, a*nz
+    r_1 = np.sqrt((dx - ax)**2 + (dy - ay)**2 + (dz - az)**2)
+    r_2 = np.sqrt((dx + ax)**2 + (dy + ay)**2 + (dz + az)**2)
+    t = 2 * a * (dx*nx + dy*ny + dz*nz)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return charge * K * 2*t / (r_1 * r_2 * (r_1 + r_2))
+
+
+class _Node:
+    '''
+    Purpose: one cell of the octree with its multipole moments about center
+    '''
+    __slots__ = ('index', 'center', 'radius', 'moment', 'quadrupole', 'children')
+
+    def __init__(self, index, center, radius, moment, quadrupole, children):
+        self.index = index
+        self.center = center
+        self.radius = radius
+        self.moment = moment
+        self.quadrupole = quadrupole
+        self.children = children
+
+
+class DipoleArray:
+    '''
+    Purpose: to superpose the potentials of many two-charge dipoles at many observation points
+
+    Parameters   :
+                   a) positions    - (N, 3) centers of the dipoles in meters
+                   b) orientations - (N, 3) directions from the negative to the positive charge, normalized here
+                   c) charges      - (N,) either charge irrespective of sign in Coulomb
+                   d) separations  - (N,) distance between either charge and center of dipole in meters
+
+    Methods      :
+                   potential_direct() - exact O(N*M) summation in bounded blocks
+                   potential_tree()   - Barnes-Hut octree with dipole + quadrupole cell moments, theta
+                                        is the opening angle (cell radius / distance) controlling the error
+                   potential()        - picks direct or tree from the problem size
+    '''
+
+    def __init__(self, positions, orientations, charges, separations):
+        self.positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+        n = len(self.positions)
+        orientations = np.broadcast_to(np.asarray(orientations, dtype=np.float64), (n, 3))
+        self.orientations = orientations / np.linalg.norm(orientations, axis=1, keepdims=True)
+        self.charges = np.broadcast_to(np.asarray(charges, dtype=np.float64), (n,)).copy()
+        self.separations = np.broadcast_to(np.asarray(separations, dtype=np.float64), (n,)).copy()
+        self._tree = None
+        self._tree_leaf_size = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _direct(self, targets, index):
+        '''
+        Purpose: to sum the dipoles in index at targets exactly, in blocks of at most MAX_PAIRS pairs
+
+        Return: returns (M,) array
+        '''
+        out = np.zeros(len(targets))
+        if not len(index) or not len(targets):
+            return out
+        cx, cy, cz = self.positions[index].T
+        nx, ny, nz = self.orientations[index].T
+        charge, a = self.charges[index], self.separations[index]
+
+        step = max(1, MAX_PAIRS // len(index))
+        for start in range(0, len(targets), step):
+            tx, ty, tz = targets[start:start + step].T
+            dx, dy, dz = tx[:, None] - cx, ty[:, None] - cy, tz[:, None] - cz
+            out[start:start + step] = _pair_potential(dx, dy, dz, nx, ny, nz, charge, a).sum(axis=1)
+        return out
+
+    def potential_direct(self, targets):
+        '''
+        Purpose: to calculate the exact superposed potential at targets
+
+        Return: returns (M,) array of potentials
+        '''
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        return self._direct(targets, np.arange(len(self)))
+
+    def _build(self, index, leaf_size):
+        '''
+        Purpose: to build the octree cell holding the dipoles in index, together with its moments
+
+        Return: returns _Node
+        '''
+        centers = self.positions[index]
+        n, charge, a = self.orientations[index], self.charges[index], self.separations[index]
+
+        # Moments about the centroid of the dipole centers, charges sit at center +/- a*n
+        center = centers.mean(axis=0)
+        y = centers - center
+        moment = 2 * ((a * charge)[:, None] * n).sum(axis=0)
+        quadrupole = np.zeros((3, 3))
+        for sign in (1, -1):
+            pos = y + sign * a[:, None] * n
+            weight = sign * charge
+            quadrupole += 3 * np.einsum('i,ij,ik->jk', weight, pos, pos)
+            quadrupole -= np.eye(3) * np.sum(weight * np.einsum('ij,ij->i', pos, pos))
+        radius = np.max(np.linalg.norm(y, axis=1) + a)
+
+        children = None
+        if len(index) > leaf_size and np.ptp(centers, axis=0).max() > 0:
+            mid = (centers.min(axis=0) + centers.max(axis=0)) / 2
+            code = (centers[:, 0] > mid[0]) + 2*(centers[:, 1] > mid[1]) + 4*(centers[:, 2] > mid[2])
+            children = [self._build(index[code == octant], leaf_size) for octant in range(8) if np.any(code == octant)]
+
+        return _Node(index, center, radius, moment, quadrupole, children)
+
+    def tree(self, leaf_size=32):
+        '''
+        Purpose: to build the octree once and reuse it for later calls with the same leaf_size
+
+        Return: returns the root _Node
+        '''
+        if self._tree is None or self._tree_leaf_size != leaf_size:
+            self._tree = self._build(np.arange(len(self)), leaf_size)
+            self._tree_leaf_size = leaf_size
+        return self._tree
+
+    def potential_tree(self, targets, theta=0.5, leaf_size=32):
+        '''
+        Purpose      : To calculate the superposed potential with the Barnes-Hut approximation
+
+        Formula Used :
+
+                A cell of radius s seen from distance d with s/d < theta is replaced by its moments,
+
+                    const_k * ( p.d / |d|^3 + d.Q.d / (2*|d|^5) )
+
+                otherwise its children are visited, leaves are summed directly. Smaller theta is more accurate
+                and slower, theta = 0 reduces to direct summation.
+
+        Return: returns (M,) array of potentials
+        '''
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        out = np.zeros(len(targets))
+        stack = [(self.tree(leaf_size), np.arange(len(targets)))]
+
+        while stack:
+            node, which = stack.pop()
+            d = targets[which] - node.center
+            dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+            far = node.radius < theta * dist
+
+            if far.any():
+                df, rf = d[far], dist[far]
+                dipole_term = df @ node.moment / rf**3
+                quad_term = np.einsum('ij,jk,ik->i', df, node.quadrupole, df) / (2 * rf**5)
+                out[which[far]] += K * (dipole_term + quad_term)
+
+            near = which[~far]
+            if not near.size:
+                continue
+            if node.children is None:
+                out[near] += self._direct(targets[near], node.index)
+            else:
+                stack.extend((child, near) for child in node.children)
+
+        return out
+
+    def potential(self, targets, method='auto', theta=0.5, leaf_size=32):
+        '''
+        Purpose: to calculate the superposed potential, method is 'direct', 'tree' or 'auto'
+
+        Return: returns (M,) array of potentials
+        '''
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        if method == 'auto':
+            method = 'direct' if len(targets) * len(self) <= DIRECT_LIMIT else 'tree'
+        if method == 'direct':
+            return self.potential_direct(targets)
+        if method == 'tree':
+            return self.potential_tree(targets, theta, leaf_size)
+        raise ValueError('Unknown method %r' % method)
@@ -0,0 +1,173 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from threading import Event
+
+from mpmath import mp
+
+from EF_of_dipole import potential_mp, exact_potential
+from EF_units import DipoleInput
+from EF_store import precision_key
+
+# * Default precision of sweep workers, the old global setting of the calculator
+DEFAULT_DPS = 100
+
+
+class SweepCancelled(Exception):
+    '''
+    Purpose: raised by SweepExecutor.run() when cancel() was called before the sweep finished
+    '''
+
+
+# * ResultStore of the current worker process, set once by _init_worker() so it keeps one connection
+_worker_store = None
+
+
+def _init_worker(dps, store=None):
+    '''
+    Purpose: to set the precision of one worker process and the store it writes its results to
+    '''
+    global _worker_store
+    mp.dps = dps
+    _worker_store = store
+
+
+def _evaluate_chunk(start, rows, rtol):
+    '''
+    Purpose: to evaluate one chunk of SI (r, cos_theta, charge, a) rows inside a worker
+
+             With a worker store the results are also written to it from the worker.
+
+             Values are returned as raw mpf tuples, an unpickled mpf would be rounded to the
+             precision of the parent process.
+
+    Return: returns (start, list of (sign, mantissa, exponent, bits) tuples of the exact potentials)
+    '''
+    if rtol is None:
+        values = [potential_mp(*row) for row in rows]
+    else:
+        values = [exact_potential(*row, rtol=rtol)[0] for row in rows]
+    if _worker_store is not None:
+        _worker_store.put_many(rows, values, precision_key(mp.dps, rtol))
+    return start, [value._mpf_ for value in values]
+
+
+class SweepExecutor:
+    '''
+    Purpose: to run a parameter sweep of the exact potential on a pool of processes
+
+    Usage        :
+                   executor = SweepExecutor(workers=8, dps=100)
+                   values = executor.run(points, progress=lambda done, total: ...)
+
+                   points is an iterable of (r, theta, charge, a), each as (value, unit), compact string
+                   or SI number. Inputs are normalized in the parent, split into chunks of chunksize
+                   rows and evaluated by workers that each set their own mp.dps. Values come back
+                   in input order with the full precision of the workers. cancel() may be called
+                   from another thread or from the progress callback, run() then raises SweepCancelled.
+
+                   With an EF_store.ResultStore, chunks are looked up first and only the missing
+                   rows go to the workers, which add their results to the store.
+    '''
+
+    def __init__(self, workers=None, dps=DEFAULT_DPS, chunksize=256, rtol=None, store=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.dps = dps
+        self.chunksize = chunksize
+        self.rtol = rtol    # None evaluates at fixed dps, otherwise plan_precision() picks the path
+        self.store = store
+        self._cancelled = Event()
+
+    def cancel(self):
+        '''
+        Purpose: to stop the running sweep, chunks not yet started are dropped
+        '''
+        self._cancelled.set()
+
+    def _chunks(self, points):
+        '''
+        Purpose: to normalize points and group them into chunks
+
+        Return: yields (start index, list of SI rows)
+        '''
+        rows = []
+        start = 0
+        for r, theta, charge, a in points:
+            inp = DipoleInput(r, theta, charge, a)
+            rows.append((inp.r, inp.cos_theta, inp.charge, inp.a))
+            if len(rows) == self.chunksize:
+                yield start, rows
+                start += len(rows)
+                rows = []
+        if rows:
+            yield start, rows
+
+    def run(self, points, progress=None):
+        '''
+        Purpose: to evaluate every point of the sweep
+
+        Parameters   :
+                   a) points   - iterable of (r, theta, charge, a)
+                   b) progress - optional callable(done, total), total is None when points has no len()
+
+        Return: returns list of exact potentials in input order
+        '''
+        self._cancelled.clear()
+        total = len(points) if hasattr(points, '__len__') else None
+        chunks = self._chunks(points)
+        results = {}
+        stored = {}
+        done = 0
+        max_pending = 4 * self.workers
+        precision = precision_key(self.dps, self.rtol)
+
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                 initargs=(self.dps, self.store)) as pool:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                # Keeping a bounded number of chunks in flight
+                while not exhausted and len(pending) < max_pending and not self._cancelled.is_set():
+                    try:
+                        start, rows = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    if self.store is not None:
+                        values = self.store.get_many(rows, precision)
+                        missing = [i for i, value in enumerate(values) if value is None]
+                        if not missing:
+                            results[start] = values
+                            done += len(values)
+                            if progress is not None:
+                                progress(done, total)
+                            continue
+                        stored[start] = (values, missing)
+                        rows = [rows[i] for i in missing]
+                    pending.add(pool.submit(_evaluate_chunk, start, rows, self.rtol))
+
+                if self._cancelled.is_set():
+                    for future in pending:
+                        future.cancel()
+                    raise SweepCancelled('sweep cancelled after %d points' % done)
+
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, values = future.result()
+                    values = [mp.make_mpf(value) for value in values]
+                    if start in stored:
+                        merged, missing = stored.pop(start)
+                        for i, value in zip(missing, values):
+                            merged[i] = value
+                        values = merged
+                    results[start] = values
+                    done += len(values)
+                if progress is not None:
+                    progress(done, total)
+
+        ordered = []
+        for start in sorted(results):
+            ordered.extend(results[start])
+        return ordered
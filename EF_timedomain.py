@@ -0,0 +1,189 @@
+'''
+Purpose: streaming time-domain simulation of a dipole whose orientation, charge or separation vary in time
+
+Usage  :
+         sensors = SensorArray(positions)
+         for start, t, V, E in simulate(sensors, times, rotating((0, 0, 1), 2*np.pi*50), 1e-9, 1e-10, field=True):
+             ...                                  # V is (steps, sensors), E is (steps, sensors, 3)
+
+         simulate_to_file('V.npy', sensors, times, orientation, charge, a, field_path='E.npy')
+
+The dipole sits at the origin, its positive charge at +a*n(t). orientation, charge and a are each a
+constant or a callable of a time array, e.g. rotating() and oscillating(). Steps are processed in
+chunks of at most max_elements (step, sensor) pairs, so memory depends on the chunk size only.
+'''
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from EF_batch import K
+
+# * Largest number of (step, sensor) pairs evaluated at once
+MAX_CHUNK_ELEMENTS = 1 << 18
+
+
+class SensorArray:
+    '''
+    Purpose: fixed sensor positions with the geometry that does not change between time steps
+
+    Parameters   : positions - (M, 3) coordinates in meters, or (M, 2) in the plane z = 0
+    '''
+    def __init__(self, positions):
+        positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+        if positions.shape[1] == 2:
+            positions = np.column_stack([positions, np.zeros(len(positions))])
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def terms(self, n, charge, a, field=False):
+        '''
+        Purpose      : To calculate potential (and field) at every sensor for a chunk of steps
+
+        Formula Used :
+
+                r_1, r_2 = |P -/+ a*n|
+
+                V = (q*const_k) * 4*a*(n.P) / (r_1 * r_2 * (r_1 + r_2))
+                E = (q*const_k) * ( P*(1/r_1^3 - 1/r_2^3) - a*n*(1/r_1^3 + 1/r_2^3) )
+
+                with 1/r_1^3 - 1/r_2^3 from the cancellation-free 1/r_1 - 1/r_2 as in EF_field.field_terms(),
+                r_1 and r_2 are norms of the offsets from each charge so they stay accurate next to a charge
+
+        Parameters   :
+                   a) n         - (T, 3) unit orientations
+                   b) charge, a - (T,) charge and half separation
+
+        Return: returns V as (T, M) array, and E as (T, M, 3) array when field is True
+        '''
+        kq = (charge * K)[:, None]
+        a = a[:, None]
+        t = 2 * a * (n @ self.positions.T)
+        offset = a[..., None] * n[:, None, :]
+        r_1 = np.linalg.norm(self.positions - offset, axis=-1)
+        r_2 = np.linalg.norm(self.positions + offset, axis=-1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_diff = 2*t / (r_1 * r_2 * (r_1 + r_2))
+            V = kq * inv_diff
+            if not field:
+                return V
+
+            r_1_sq, r_2_sq = r_1 * r_1, r_2 * r_2
+            cube_sum = 1/(r_1_sq * r_1) + 1/(r_2_sq * r_2)
+            cube_diff = inv_diff * (r_1_sq + r_1*r_2 + r_2_sq) / (r_1_sq * r_2_sq)
+            E = kq[..., None] * (cube_diff[..., None] * self.positions - (a * cube_sum)[..., None] * n[:, None, :])
+        return V, E
+
+
+def rotating(axis, omega, start=None, phase=0.0):
+    '''
+    Purpose: to build an orientation schedule rotating about axis with angular velocity omega (rad/s)
+
+             start is the orientation at t = 0, by default a direction perpendicular to axis.
+
+    Return: returns callable(t) -> (T, 3) unit vectors
+    '''
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    if start is None:
+        start = np.cross(axis, [1.0, 0, 0] if abs(axis[0]) < 0.9 else [0, 1.0, 0])
+    start = np.asarray(start, dtype=np.float64)
+    start = start / np.linalg.norm(start)
+    along = np.dot(axis, start) * axis
+    across, third = start - along, np.cross(axis, start)
+
+    def orientation(t):
+        angle = omega * np.asarray(t, dtype=np.float64)[:, None] + phase
+        return along + across * np.cos(angle) + third * np.sin(angle)
+
+    return orientation
+
+
+def oscillating(amplitude, omega, phase=0.0, offset=0.0):
+    '''
+    Purpose: to build a schedule offset + amplitude*Cos(omega*t + phase), e.g. the charge of an AC source
+
+    Return: returns callable(t) -> (T,) array
+    '''
+    def value(t):
+        return offset + amplitude * np.cos(omega * np.asarray(t, dtype=np.float64) + phase)
+
+    return value
+
+
+def _evaluate_schedule(value, t, shape):
+    '''
+    Purpose: to get a schedule at the times t, constants are broadcast
+
+    Return: returns float64 array of (len(t),) + shape
+    '''
+    if callable(value):
+        value = value(t)
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (len(t),) + shape)
+
+
+def simulate(sensors, times, orientation, charge, a, field=False, max_elements=MAX_CHUNK_ELEMENTS):
+    '''
+    Purpose      : To step the dipole through times and yield the results chunk by chunk
+
+    Parameters   :
+                   a) sensors      - SensorArray, or positions to build one from
+                   b) times        - 1D array of times in seconds
+                   c) orientation  - (3,) vector or callable(t) -> (T, 3), normalized here
+                   d) charge       - Coulomb, constant or callable(t) -> (T,)
+                   e) a            - half separation in meters, constant or callable(t) -> (T,)
+                   f) field        - also yield the field vectors
+                   g) max_elements - largest number of (step, sensor) pairs per chunk
+
+    Return: yields (start, t, V) or (start, t, V, E), start being the index of the first step of the chunk
+    '''
+    if not isinstance(sensors, SensorArray):
+        sensors = SensorArray(sensors)
+    times = np.asarray(times, dtype=np.float64)
+    step = max(1, max_elements // max(len(sensors), 1))
+
+    for start in range(0, len(times), step):
+        t = times[start:start + step]
+        n = _evaluate_schedule(orientation, t, (3,))
+        n = n / np.linalg.norm(n, axis=1, keepdims=True)
+        results = sensors.terms(n, _evaluate_schedule(charge, t, ()), _evaluate_schedule(a, t, ()), field)
+        if field:
+            yield (start, t) + results
+        else:
+            yield start, t, results
+
+
+def simulate_to_file(path, sensors, times, orientation, charge, a, field_path=None,
+                     max_elements=MAX_CHUNK_ELEMENTS, progress=None):
+    '''
+    Purpose: to stream a simulation into memory-mapped .npy files, (steps, sensors) for V and
+             (steps, sensors, 3) for E when field_path is given
+
+    Parameters: as for simulate(), progress is an optional callable(done steps, total steps)
+
+    Return: returns the memory-mapped potential (and field when field_path is given)
+    '''
+    if not isinstance(sensors, SensorArray):
+        sensors = SensorArray(sensors)
+    times = np.asarray(times, dtype=np.float64)
+    field = field_path is not None
+
+    V_map = open_memmap(path, mode='w+', dtype=np.float64, shape=(len(times), len(sensors)))
+    E_map = None
+    if field:
+        E_map = open_memmap(field_path, mode='w+', dtype=np.float64, shape=(len(times), len(sensors), 3))
+
+    for chunk in simulate(sensors, times, orientation, charge, a, field, max_elements):
+        start, t, V = chunk[:3]
+        V_map[start:start + len(t)] = V
+        if field:
+            E_map[start:start + len(t)] = chunk[3]
+        if progress is not None:
+            progress(start + len(t), len(times))
+
+    V_map.flush()
+    if E_map is None:
+        return V_map
+    E_map.flush()
+    return V_map, E_map
@@ -0,0 +1,205 @@
+'''
+Purpose: batched tracing of field lines and equipotential curves of the dipole in the plane z = 0
+
+Usage  :
+         lines = field_lines(seed_circle(1e-10, 1e-11, 36), charge=1e-6, a=1e-10)
+         for k in range(len(lines.status)):
+             xy = lines.points[lines.offsets[k]:lines.offsets[k+1]]
+
+Every active line advances in the same vectorized Bogacki-Shampine 3(2) step, each with its own
+adaptive step size. The dipole lies along the x axis with the positive charge at x = +a, as in
+EF_fieldmap. Results are returned in compressed form: all points of all lines in one array,
+line k being points[offsets[k]:offsets[k+1]].
+'''
+from collections import namedtuple
+
+import numpy as np
+
+from EF_field import field_terms
+
+# * Status codes of traced lines
+RUNNING = 0         # stopped by max_steps
+HIT_CHARGE = 1
+LEFT_DOMAIN = 2
+CLOSED = 3
+
+# * Largest step as a fraction of the distance to the nearest charge, and step size limits per step
+MAX_STEP_FRACTION = 0.1
+MIN_SHRINK, MAX_GROW = 0.2, 5.0
+
+Polylines = namedtuple('Polylines', ['points', 'offsets', 'status'])
+
+
+def field_xy(x, y, charge, a):
+    '''
+    Purpose      : To calculate the Cartesian components of the field in the plane z = 0
+
+    Formula Used :
+
+            E_r and E_theta from EF_field.field_terms() with Cos(theta) = x/r, Sin(theta) = |y|/r, then
+
+                E_x = E_r*Cos(theta) - E_theta*Sin(theta)
+                E_y = sign(y) * (E_r*Sin(theta) + E_theta*Cos(theta))
+
+    Return: returns (E_x, E_y, r_1, r_2), r_1 and r_2 being the distances to the positive and negative charge
+    '''
+    r = np.hypot(x, y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_theta, sin_theta = x / r, np.abs(y) / r
+        _, E_r, E_theta, _ = field_terms(r, cos_theta, sin_theta, charge, a)
+    E_x = E_r*cos_theta - E_theta*sin_theta
+    E_y = np.where(y < 0, -1.0, 1.0) * (E_r*sin_theta + E_theta*cos_theta)
+    return E_x, E_y, np.hypot(x - a, y), np.hypot(x + a, y)
+
+
+def _tangent(p, charge, a, equipotential, sign):
+    '''
+    Purpose: to calculate the unit tangent of the traced curves at points p
+
+    Return: returns ((n, 2) tangents, (n,) distance to the nearest charge)
+    '''
+    E_x, E_y, r_1, r_2 = field_xy(p[:, 0], p[:, 1], charge, a)
+    norm = np.hypot(E_x, E_y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if equipotential:
+            tangent = np.column_stack([-E_y, E_x]) / norm[:, None]
+        else:
+            tangent = sign * np.column_stack([E_x, E_y]) / norm[:, None]
+    return tangent, np.minimum(r_1, r_2)
+
+
+def trace(seeds, charge, a, equipotential=False, direction=1, extent=None, rtol=1e-6,
+          stop_radius=None, max_steps=10000):
+    '''
+    Purpose      : To trace many field lines or equipotential curves at once
+
+    Formula Used :
+
+            dp/ds = sign * E/|E|              for field lines
+            dp/ds = (-E_y, E_x)/|E|           for equipotentials
+
+            integrated with embedded Bogacki-Shampine 3(2) steps. A step is accepted when the
+            difference of the two solutions is below rtol times the distance d to the nearest
+            charge, the next step is scaled by 0.9*(tol/err)^(1/3) and kept below MAX_STEP_FRACTION*d,
+            so lines slow down close to the charges and stride far from them.
+
+    Parameters   :
+                   a) seeds         - (n, 2) starting points in meters
+                   b) charge, a     - charge in Coulomb and half separation in meters
+                   c) equipotential - trace equipotentials instead of field lines
+                   d) direction     - +1 along E, -1 against E (field lines only)
+                   e) extent        - ((x_min, x_max), (y_min, y_max)), default 20*a around the dipole
+                   f) rtol          - local error per step relative to the distance to the nearest charge
+                   g) stop_radius   - lines closer than this to a charge stop, default a/100
+                   h) max_steps     - largest number of accepted steps per line
+
+    Return: returns Polylines(points, offsets, status), status is one of RUNNING, HIT_CHARGE,
+            LEFT_DOMAIN or CLOSED (equipotentials that came back to their seed)
+    '''
+    seeds = np.atleast_2d(np.asarray(seeds, dtype=np.float64))
+    n = len(seeds)
+    if extent is None:
+        extent = ((-20*a, 20*a), (-20*a, 20*a))
+    (x_min, x_max), (y_min, y_max) = extent
+    if stop_radius is None:
+        stop_radius = a / 100
+    sign = 1.0 if direction >= 0 else -1.0
+
+    def f(p):
+        return _tangent(p, charge, a, equipotential, sign)
+
+    status = np.full(n, RUNNING, dtype=np.int8)
+    steps = np.zeros(n, dtype=np.int64)
+    travelled = np.zeros(n)
+
+    # Points are recorded as (line, position) blocks and sorted by line at the end
+    line_ids, recorded = [np.arange(n)], [seeds]
+
+    active = np.arange(n)
+    p = seeds.copy()
+    k_1, dist = f(p)
+    h = MAX_STEP_FRACTION * dist
+    stopped = dist < stop_radius
+    status[stopped] = HIT_CHARGE
+
+    keep = ~stopped & np.isfinite(k_1).all(axis=1)
+    active, p, k_1, dist, h = active[keep], p[keep], k_1[keep], dist[keep], h[keep]
+
+    while active.size:
+        hh = h[:, None]
+        k_2, _ = f(p + hh/2 * k_1)
+        k_3, _ = f(p + 3*hh/4 * k_2)
+        p_3 = p + hh * (2/9*k_1 + 1/3*k_2 + 4/9*k_3)
+        k_4, dist_3 = f(p_3)
+        p_2 = p + hh * (7/24*k_1 + 1/4*k_2 + 1/3*k_3 + 1/8*k_4)
+
+        tol = rtol * dist
+        err = np.hypot(*(p_3 - p_2).T)
+        accept = (err <= tol) & np.isfinite(p_3).all(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.clip(0.9 * (tol / err)**(1/3), MIN_SHRINK, MAX_GROW)
+        factor = np.where(np.isfinite(factor), factor, MAX_GROW)
+
+        # Accepted steps move forward, reusing the last stage as the first one of the next step
+        travelled[active[accept]] += h[accept]
+        p = np.where(accept[:, None], p_3, p)
+        k_1 = np.where(accept[:, None], k_4, k_1)
+        dist = np.where(accept, dist_3, dist)
+        h_taken = h
+        h = np.minimum(h * factor, MAX_STEP_FRACTION * dist)
+
+        moved = active[accept]
+        line_ids.append(moved)
+        recorded.append(p[accept])
+        steps[moved] += 1
+
+        # Stopping lines that hit a charge, left the domain, closed on their seed or ran out of steps
+        hit = accept & (dist < stop_radius)
+        left = accept & ((p[:, 0] < x_min) | (p[:, 0] > x_max) | (p[:, 1] < y_min) | (p[:, 1] > y_max))
+        closed = np.zeros_like(accept)
+        if equipotential:
+            gap = np.hypot(*(p - seeds[active]).T)
+            closed = accept & (travelled[active] > 4*h_taken) & (gap < h_taken)
+            line_ids.append(active[closed])
+            recorded.append(seeds[active[closed]])
+        status[active[hit]] = HIT_CHARGE
+        status[active[left & ~hit]] = LEFT_DOMAIN
+        status[active[closed & ~hit & ~left]] = CLOSED
+
+        keep = ~(hit | left | closed) & (steps[active] < max_steps)
+        active, p, k_1, dist, h = active[keep], p[keep], k_1[keep], dist[keep], h[keep]
+
+    ids = np.concatenate(line_ids)
+    order = np.argsort(ids, kind='stable')
+    points = np.concatenate(recorded)[order]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=n), out=offsets[1:])
+    return Polylines(points, offsets, status)
+
+
+def field_lines(seeds, charge, a, direction=1, **options):
+    '''
+    Purpose: to trace field lines from seeds, options as for trace()
+
+    Return: returns Polylines
+    '''
+    return trace(seeds, charge, a, equipotential=False, direction=direction, **options)
+
+
+def equipotentials(seeds, charge, a, **options):
+    '''
+    Purpose: to trace the equipotential curves through seeds, options as for trace()
+
+    Return: returns Polylines
+    '''
+    return trace(seeds, charge, a, equipotential=True, **options)
+
+
+def seed_circle(x, radius, n, y=0.0):
+    '''
+    Purpose: to place n seeds evenly on a circle, e.g. around the positive charge at (a, 0)
+
+    Return: returns (n, 2) float64 array
+    '''
+    angle = 2 * np.pi * (np.arange(n) + 0.5) / n
+    return np.column_stack([x + radius*np.cos(angle), y + radius*np.sin(angle)])
@@ -0,0 +1,121 @@
+import re
+from math import cos, sin, pi
+from time import perf_counter
+
+import EF_profile
+
+# * SI scale factors of every unit accepted by the calculator, aliases included
+LENGTH_UNITS = {
+    'meters': 1.0, 'meter': 1.0, 'm': 1.0,
+    'centimeters': 1e-2, 'centimeter': 1e-2, 'cm': 1e-2,
+    'millimeters': 1e-3, 'millimeter': 1e-3, 'mm': 1e-3,
+    'micrometers': 1e-6, 'micrometer': 1e-6, 'um': 1e-6, 'µm': 1e-6,
+    'nanometers': 1e-9, 'nanometer': 1e-9, 'nm': 1e-9,
+    'angstroms': 1e-10, 'angstrom': 1e-10, 'a': 1e-10, 'A': 1e-10, 'Å': 1e-10,
+}
+
+ELECTRON_CHARGE = 1.60217646e-19                                                                                   # 1.60217646⋅10-19
+
+CHARGE_UNITS = {
+    'Coulomb': 1.0, 'C': 1.0,
+    'milliCoulomb': 1e-3, 'mC': 1e-3,
+    'microCoulomb': 1e-6, 'uC': 1e-6, 'µC': 1e-6,
+    'nanoCoulomb': 1e-9, 'nC': 1e-9,
+    'picoCoulomb': 1e-12, 'picoCharge': 1e-12, 'picoColomb': 1e-12, 'pC': 1e-12,
+    'electronCharge': ELECTRON_CHARGE, 'eC': ELECTRON_CHARGE, 'e': ELECTRON_CHARGE,
+}
+
+ANGLE_UNITS = {
+    'radians': 1.0, 'radian': 1.0, 'rad': 1.0,
+    'degrees': pi/180, 'degree': pi/180, 'deg': pi/180, '°': pi/180,
+}
+
+# * Unit names up to this long are symbols ('m', 'mC', 'deg') and must match case exactly, 'MC' is not 'mC'
+SYMBOL_LENGTH = 3
+
+_QUANTITY = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(\S*)\s*$')
+
+
+def unit_scale(unit, units):
+    '''
+    Purpose: to find the SI scale factor of a unit, long names like 'Meters' or 'Degrees' from the GUI
+             fall back to a case-insensitive match, symbols must match exactly
+
+    Return: returns the scale factor, raises ValueError for unknown units
+    '''
+    try:
+        return units[unit]
+    except KeyError:
+        pass
+    for name, scale in units.items():
+        if len(name) > SYMBOL_LENGTH and name.lower() == unit.lower():
+            return scale
+    raise ValueError('Unknown unit %r' % unit)
+
+
+def parse_quantity(text):
+    '''
+    Purpose: to split a compact quantity string like "3.2 nm" or "5uC" into value and unit
+
+    Return: returns (value, unit), unit is None when the string is a bare number
+    '''
+    match = _QUANTITY.match(text)
+    if match is None:
+        raise ValueError('Invalid quantity %r' % text)
+    return float(match.group(1)), match.group(2) or None
+
+
+def to_si(quantity, units):
+    '''
+    Purpose: to convert a quantity to SI units
+
+    Parameters   :
+                   a) quantity - (value, unit) tuple, compact string like "3.2 nm" or a bare number already in SI
+                   b) units    - one of LENGTH_UNITS, CHARGE_UNITS, ANGLE_UNITS
+
+    Return: returns the value in SI units as float
+    '''
+    if isinstance(quantity, str):
+        quantity = parse_quantity(quantity)
+    elif not isinstance(quantity, (tuple, list)):
+        return float(quantity)
+
+    value, unit = quantity
+    if unit is None:
+        return float(value)
+    return float(value) * unit_scale(unit, units)
+
+
+class DipoleInput:
+    '''
+    Purpose: to hold the inputs of one calculation converted to SI units exactly once
+
+    Attributes   :
+                   a) r         - distance between center of the dipole and point of observation in meters
+                   b) theta     - angle in radians
+                   c) charge    - charge in Coulomb
+                   d) a         - distance between either charge and center of dipole in meters
+                   e) cos_theta - Cos(theta) rounded to 5 places, as used by the calculator formulas
+                   f) sin_theta - Sin(theta) rounded to 5 places, as used by the field formulas
+    '''
+    __slots__ = ('r', 'theta', 'charge', 'a', 'cos_theta', 'sin_theta')
+
+    def __init__(self, r, theta, charge, a):
+        prof = EF_profile.active
+        if prof is not None:
+            t = perf_counter()
+
+        self.r = to_si(r, LENGTH_UNITS)
+        self.theta = to_si(theta, ANGLE_UNITS)
+        self.charge = to_si(charge, CHARGE_UNITS)
+        self.a = to_si(a, LENGTH_UNITS)
+        if prof is not None:
+            t = prof.lap('units', t)
+
+        self.cos_theta = round(cos(self.theta), 5)
+        self.sin_theta = round(sin(self.theta), 5)
+        if prof is not None:
+            prof.lap('cos', t)
+
+    def __repr__(self):
+        return 'DipoleInput(r=%r, theta=%r, charge=%r, a=%r)' % (self.r, self.theta, self.charge, self.a)
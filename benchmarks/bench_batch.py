@@ -0,0 +1,70 @@
+'''
+Purpose: to compare dipole_batch() against a Python loop over dipole() and dipole_approx()
+
+Usage  : python benchmarks/bench_batch.py [number of points]
+'''
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EF_of_dipole import dipole, dipole_approx, diff
+from EF_batch import dipole_batch
+
+
+def make_points(n, seed=0):
+    '''
+    Purpose: to generate n random (r, theta, charge, a) points in SI units with a << r
+
+    Return: returns tuple of four float64 arrays
+    '''
+    rng = np.random.default_rng(seed)
+    r = rng.uniform(1e-3, 1.0, n)
+    theta = rng.uniform(0, np.pi, n)
+    charge = rng.uniform(1e-9, 1e-6, n)
+    a = rng.uniform(1e-10, 1e-6, n)
+    return r, theta, charge, a
+
+
+def loop(r, theta, charge, a):
+    '''
+    Purpose: to evaluate every point through the scalar functions
+
+    Return: returns list of (exact, approx, diff) tuples
+    '''
+    results = []
+    for r_i, theta_i, charge_i, a_i in zip(r.tolist(), theta.tolist(), charge.tolist(), a.tolist()):
+        EP = dipole((r_i, 'meters'), (theta_i, 'radians'), (charge_i, 'Coulomb'), (a_i, 'meters'))
+        AP = dipole_approx((r_i, 'meters'), (theta_i, 'radians'), (charge_i, 'Coulomb'), (a_i, 'meters'))
+        results.append((EP, AP, diff(EP, AP)))
+    return results
+
+
+def main(n):
+    r, theta, charge, a = make_points(n)
+
+    # Scalar loop is slow, so time it on a subset and scale
+    n_loop = min(n, 2000)
+    start = perf_counter()
+    reference = loop(r[:n_loop], theta[:n_loop], charge[:n_loop], a[:n_loop])
+    loop_time = (perf_counter() - start) * n / n_loop
+
+    start = perf_counter()
+    exact, approx, error = dipole_batch(r, theta, charge, a)
+    batch_time = perf_counter() - start
+
+    ref_exact = np.array([float(EP) for EP, _, _ in reference])
+    rel_err = np.max(np.abs(exact[:n_loop] - ref_exact) / np.abs(ref_exact))
+
+    print('points          : %d' % n)
+    print('scalar loop     : %.3f s (extrapolated from %d points)' % (loop_time, n_loop))
+    print('dipole_batch    : %.3f s' % batch_time)
+    print('speedup         : %.0fx' % (loop_time / batch_time))
+    print('max rel. error  : %.3e' % rel_err)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,76 @@
+'''
+Purpose: to check the double-double kernel against mpmath and compare its throughput with float64 and mpmath
+
+Usage  : python benchmarks/bench_ddouble.py [number of points]
+
+Exits with code 1 when the double-double error exceeds DD_ACCURACY_LIMIT.
+'''
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+from mpmath import mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EF_of_dipole import potential_mp
+from EF_batch import dipole_exact_batch
+from EF_ddouble import dipole_dd_batch, to_mpf
+
+# * Largest relative error of the double-double kernel accepted against the mpmath reference
+DD_ACCURACY_LIMIT = 1e-29
+
+
+def make_points(n, seed=0):
+    '''
+    Purpose: to generate n random SI points with separations from 1e-20 m up to 1e-2 m
+
+    Return: returns tuple of four float64 arrays
+    '''
+    rng = np.random.default_rng(seed)
+    r = rng.uniform(1e-3, 10.0, n)
+    theta = rng.uniform(0, np.pi, n)
+    charge = rng.uniform(1e-9, 1e-6, n)
+    a = 10 ** rng.uniform(-20, -2, n)
+    return r, theta, charge, a
+
+
+def main(n):
+    r, theta, charge, a = make_points(n)
+    cos_theta = np.round(np.cos(theta), 5)
+
+    start = perf_counter()
+    hi, lo = dipole_dd_batch(r, theta, charge, a)
+    dd_seconds = perf_counter() - start
+
+    start = perf_counter()
+    exact = dipole_exact_batch(r, theta, charge, a)
+    f64_seconds = perf_counter() - start
+
+    m = min(n, 2000)
+    start = perf_counter()
+    with mp.workdps(100):
+        reference = [potential_mp(*row) for row in zip(r[:m].tolist(), cos_theta[:m].tolist(),
+                                                         charge[:m].tolist(), a[:m].tolist())]
+    mp_seconds = (perf_counter() - start) * n / m
+
+    with mp.workdps(100):
+        dd_error = max(abs(to_mpf((hi[i], lo[i])) / reference[i] - 1) for i in range(m))
+        f64_error = max(abs(mp.mpf(exact[i]) / reference[i] - 1) for i in range(m))
+
+    print('points: %d (accuracy on the first %d against 100 digit mpmath)' % (n, m))
+    print('%-14s %12s %12s' % ('kernel', 'seconds', 'max rel err'))
+    print('%-14s %12.4f %12.2e' % ('float64', f64_seconds, float(f64_error)))
+    print('%-14s %12.4f %12.2e' % ('double-double', dd_seconds, float(dd_error)))
+    print('%-14s %12.4f %12s' % ('mpmath 100dps', mp_seconds, 'reference'))
+    print('double-double is %.0fx faster than mpmath' % (mp_seconds / dd_seconds))
+
+    if not dd_error <= DD_ACCURACY_LIMIT:
+        print('FAILED: double-double error %.2e above %.0e' % (float(dd_error), DD_ACCURACY_LIMIT))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10**6))
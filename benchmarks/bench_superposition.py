@@ -0,0 +1,46 @@
+'''
+Purpose: to find the crossover between direct summation and the Barnes-Hut tree in DipoleArray
+
+Usage  : python benchmarks/bench_superposition.py [number of targets] [theta]
+'''
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EF_superposition import DipoleArray
+
+
+def main(m, theta):
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(-1.5, 1.5, (m, 3))
+
+    print('targets: %d, theta: %.2f' % (m, theta))
+    print('%8s %10s %10s %12s' % ('dipoles', 'direct s', 'tree s', 'max rel err'))
+    crossover = None
+    for n in (100, 300, 1000, 3000, 10000, 30000):
+        dipoles = DipoleArray(rng.uniform(-1, 1, (n, 3)), rng.normal(size=(n, 3)),
+                              rng.uniform(1e-9, 1e-8, n), rng.uniform(1e-4, 1e-3, n))
+
+        start = perf_counter()
+        reference = dipoles.potential_direct(targets)
+        direct = perf_counter() - start
+
+        start = perf_counter()
+        approx = dipoles.potential_tree(targets, theta)       # includes building the tree
+        tree = perf_counter() - start
+
+        error = np.max(np.abs(approx - reference)) / np.max(np.abs(reference))
+        print('%8d %10.3f %10.3f %12.2e' % (n, direct, tree, error))
+        if crossover is None and tree < direct:
+            crossover = n
+
+    print('tree faster from about %s dipoles' % (crossover or 'more than 30000'))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.5)
@@ -0,0 +1,38 @@
+'''
+Purpose: to measure how SweepExecutor scales with the number of worker processes
+
+Usage  : python benchmarks/bench_sweep.py [number of points] [dps]
+'''
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EF_sweep import SweepExecutor
+
+
+def main(n, dps):
+    rng = np.random.default_rng(0)
+    points = list(zip(rng.uniform(1e-3, 1.0, n).tolist(), rng.uniform(0, np.pi, n).tolist(),
+                      rng.uniform(1e-9, 1e-6, n).tolist(), rng.uniform(1e-10, 1e-6, n).tolist()))
+
+    counts = sorted({1, 2, 4, 8, 16, 32, 64, os.cpu_count() or 1})
+    counts = [c for c in counts if c <= (os.cpu_count() or 1)]
+
+    print('points: %d, dps: %d, cpus: %d' % (n, dps, os.cpu_count() or 1))
+    print('%8s %10s %12s %8s' % ('workers', 'seconds', 'points/s', 'speedup'))
+    base = None
+    for workers in counts:
+        start = perf_counter()
+        SweepExecutor(workers=workers, dps=dps).run(points)
+        elapsed = perf_counter() - start
+        base = base or elapsed
+        print('%8d %10.3f %12.0f %8.2f' % (workers, elapsed, n / elapsed, base / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,83 @@
+'''
+Purpose: load-test client of EF_server.py, reports throughput and p50/p99 latency
+
+Usage  : python benchmarks/load_client.py --requests 20000 --concurrency 200 [--distinct 1000] [--rtol 1e-30]
+'''
+import argparse
+import asyncio
+import json
+import random
+from time import perf_counter
+
+
+async def client(host, port, bodies, latencies, statuses):
+    '''
+    Purpose: to send bodies one after another over one keep-alive connection
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            data = json.dumps(body).encode()
+            start = perf_counter()
+            writer.write(b'POST /evaluate HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\n\r\n' % (host.encode(), len(data)) + data)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+
+            latencies.append(perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(args):
+    rng = random.Random(0)
+    pool = [{'r': rng.uniform(0.01, 1.0), 'theta': rng.uniform(0, 3.14159), 'q': rng.uniform(1e-9, 1e-6),
+             'a': rng.uniform(1e-10, 1e-6)} for _ in range(args.distinct or args.requests)]
+    if args.rtol is not None:
+        for body in pool:
+            body['rtol'] = args.rtol
+    bodies = [pool[i % len(pool)] for i in range(args.requests)]
+    rng.shuffle(bodies)
+
+    per_client = [bodies[i::args.concurrency] for i in range(args.concurrency)]
+    latencies, statuses = [], {}
+    start = perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, chunk, latencies, statuses) for chunk in per_client if chunk))
+    elapsed = perf_counter() - start
+
+    print('requests    : %d in %.3f s' % (len(latencies), elapsed))
+    print('throughput  : %.0f req/s' % (len(latencies) / elapsed))
+    print('latency p50 : %.3f ms' % (percentile(latencies, 0.50) * 1000))
+    print('latency p99 : %.3f ms' % (percentile(latencies, 0.99) * 1000))
+    print('statuses    : %s' % statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test client of EF_server.py.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--distinct', type=int, help='number of distinct bodies, repeats exercise deduplication')
+    parser.add_argument('--rtol', type=float, help='send this rtol with every request')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
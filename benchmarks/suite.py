@@ -0,0 +1,232 @@
+'''
+Purpose: benchmark suite of the calculator core with baseline comparison
+
+Usage  :
+         python benchmarks/suite.py -o bench.json                          # run and save
+         python benchmarks/suite.py --baseline bench.json --threshold 0.25 # run and compare
+
+Cases  :
+         latency_*      - single call of the exact potential at several dps, and of dipole() / dipole_approx()
+         batch_*        - dipole_batch() throughput from 1e3 up to --max-batch points
+         grid_*         - potential_map() on a 2D grid
+         import_*       - cold import time of EF_of_dipole and main, each in a fresh interpreter
+         accuracy_*     - max relative error against a 100 digit mpmath reference, including the double-double kernel
+
+Every metric records whether lower or higher is better. With --baseline the run fails (exit code 1)
+when any metric is worse than the baseline by more than --threshold, accuracy metrics below their
+floor are never counted as regressions. Metrics with a limit fail the run whenever they exceed it,
+baseline or not, so the double-double kernel has to stay within DD_ACCURACY_FLOOR.
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mpmath import mp
+
+from EF_of_dipole import dipole, dipole_approx, potential_mp
+from EF_batch import dipole_batch
+from EF_fieldmap import potential_map
+from EF_ddouble import dipole_dd_batch, to_mpf
+
+# * Accuracy below this relative error is treated as exact when comparing with a baseline
+ACCURACY_FLOOR = 1e-14
+DD_ACCURACY_FLOOR = 1e-29
+
+
+def best_of(func, repeat=5, number=1):
+    '''
+    Purpose: to time func, keeping the best of several repeats
+
+    Return: returns seconds per call
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def random_points(n, seed=0):
+    '''
+    Purpose: to generate n random SI points with a << r
+
+    Return: returns (r, theta, charge, a) float64 arrays
+    '''
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(1e-3, 1.0, n), rng.uniform(0, np.pi, n),
+            rng.uniform(1e-9, 1e-6, n), rng.uniform(1e-10, 1e-4, n))
+
+
+def metric(value, unit, better, floor=None, limit=None):
+    '''
+    Purpose: to build one result entry, limit is the largest value accepted without any baseline
+
+    Return: returns dict
+    '''
+    entry = {'value': value, 'unit': unit, 'better': better}
+    if floor is not None:
+        entry['floor'] = floor
+    if limit is not None:
+        entry['limit'] = limit
+    return entry
+
+
+def bench_latency(results):
+    args = (1.0, 0.86603, 1e-6, 1e-10)
+    for dps in (15, 30, 50, 100):
+        with mp.workdps(dps):
+            seconds = best_of(lambda: potential_mp(*args), number=2000)
+        results['latency_mp_dps%d' % dps] = metric(seconds * 1e6, 'us', 'lower')
+
+    quantities = ((1, 'meters'), (30, 'degrees'), (1, 'microCoulomb'), (1, 'angstroms'))
+    results['latency_dipole'] = metric(best_of(lambda: dipole(*quantities), number=2000) * 1e6, 'us', 'lower')
+    results['latency_dipole_approx'] = metric(best_of(lambda: dipole_approx(*quantities), number=2000) * 1e6, 'us', 'lower')
+
+
+def bench_batch(results, max_batch):
+    n = 1000
+    while n <= max_batch:
+        points = random_points(n)
+        seconds = best_of(lambda: dipole_batch(*points), repeat=3)
+        results['batch_%.0e' % n] = metric(n / seconds, 'points/s', 'higher')
+        n *= 10
+
+
+def bench_grid(results, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'grid.npy')
+        seconds = best_of(lambda: potential_map(path, (size, size), ((-1, 1), (-1, 1)), 1e-6, 1e-3), repeat=3)
+    results['grid_%dx%d' % (size, size)] = metric(seconds, 's', 'lower')
+
+
+def bench_import(results):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    for module in ('EF_of_dipole', 'main'):
+        code = 'import time; t = time.perf_counter(); import %s; print(time.perf_counter() - t)' % module
+        times = []
+        for _ in range(3):
+            proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:      # main needs PyQt5, which may be missing on headless machines
+                break
+            times.append(float(proc.stdout.strip().splitlines()[-1]))
+        if times:
+            results['import_%s' % module] = metric(min(times) * 1000, 'ms', 'lower')
+
+
+def bench_accuracy(results, n=200):
+    r, theta, charge, a = random_points(n, seed=1)
+    cos_theta = np.round(np.cos(theta), 5)
+
+    with mp.workdps(100):
+        reference_mp = [potential_mp(*row) for row in zip(r.tolist(), cos_theta.tolist(), charge.tolist(), a.tolist())]
+    reference = np.array([float(value) for value in reference_mp])
+
+    exact = np.array([float(dipole(*row)) for row in zip(r.tolist(), theta.tolist(), charge.tolist(), a.tolist())])
+    batch = dipole_batch(r, theta, charge, a)[0]
+    hi, lo = dipole_dd_batch(r, theta, charge, a)
+
+    with mp.workdps(100):
+        dd_error = max(abs(to_mpf((hi[i], lo[i])) / reference_mp[i] - 1) for i in range(n))
+
+    results['accuracy_dipole'] = metric(float(np.max(np.abs(exact / reference - 1))), 'rel', 'lower', ACCURACY_FLOOR)
+    results['accuracy_batch'] = metric(float(np.max(np.abs(batch / reference - 1))), 'rel', 'lower', ACCURACY_FLOOR)
+    results['accuracy_ddouble'] = metric(float(dd_error), 'rel', 'lower', DD_ACCURACY_FLOOR, DD_ACCURACY_FLOOR)
+
+
+def run(max_batch, grid_size):
+    '''
+    Purpose: to run every case
+
+    Return: returns dict with meta data and results
+    '''
+    results = {}
+    bench_latency(results)
+    bench_batch(results, max_batch)
+    bench_grid(results, grid_size)
+    bench_import(results)
+    bench_accuracy(results)
+    meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+    return {'meta': meta, 'results': results}
+
+
+def compare(current, baseline, threshold):
+    '''
+    Purpose: to find metrics that got worse than the baseline by more than threshold
+
+    Return: returns list of (name, baseline value, current value, relative change)
+    '''
+    regressions = []
+    for name, base in baseline['results'].items():
+        entry = current['results'].get(name)
+        if entry is None or not base['value']:
+            continue
+        floor = entry.get('floor')
+        if floor is not None and entry['value'] <= floor:
+            continue
+
+        change = entry['value'] / base['value'] - 1
+        worse = change > threshold if entry['better'] == 'lower' else change < -threshold
+        if worse:
+            regressions.append((name, base['value'], entry['value'], change))
+    return regressions
+
+
+def check_limits(current):
+    '''
+    Purpose: to find metrics above their limit
+
+    Return: returns list of (name, value, limit)
+    '''
+    return [(name, entry['value'], entry['limit']) for name, entry in current['results'].items()
+            if 'limit' in entry and not entry['value'] <= entry['limit']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite of the calculator core.')
+    parser.add_argument('-o', '--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown (default 0.25)')
+    parser.add_argument('--max-batch', type=float, default=1e7, help='largest batch size (default 1e7)')
+    parser.add_argument('--grid', type=int, default=2048, help='side of the 2D grid case (default 2048)')
+    args = parser.parse_args(argv)
+
+    current = run(int(args.max_batch), args.grid)
+    for name, entry in current['results'].items():
+        print('%-26s %14.6g %s' % (name, entry['value'], entry['unit']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    failures = check_limits(current)
+    for name, value, limit in failures:
+        print('FAILED %s: %.6g above the limit %.6g' % (name, value, limit))
+    if failures:
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for name, base, value, change in regressions:
+            print('REGRESSION %s: %.6g -> %.6g (%+.1f%%)' % (name, base, value, change * 100))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
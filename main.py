@@ -1,18 +1,61 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QLabel, QDialog, QMessageBox
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QLabel, QDialog, QMessageBox, QCheckBox
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, QRect, pyqtSignal
 from PyQt5 import QtGui
 import sys
-import mpmath as mp
+from time import perf_counter
 from EFP_Calculator_GUI import *
 from EF_of_dipole import *
+from EF_cache import PotentialCache
+from EF_fieldview import FieldMapWindow
+import EF_profile
 from copy import deepcopy
 
-mp.dps = 100
+# * Delay after the last edit before a live recalculation starts (milliseconds)
+LIVE_DEBOUNCE_MS = 300
+
+
+class CalcSignals(QObject):
+    '''
+    Purpose: signals posted by CalcJob back to the GUI thread
+    '''
+    finished = pyqtSignal(int, object, float, str)    # job id, results of evaluate(), elapsed seconds, profile summary
+    failed = pyqtSignal(int, str)                     # job id, error message
+
+
+class CalcJob(QRunnable):
+    '''
+    Purpose: to convert one set of inputs and run evaluate() for it on a QThreadPool thread
+    '''
+    def __init__(self, job_id, inputs, cache):
+        super().__init__()
+        self.job_id = job_id
+        self.inputs = inputs    # (r, theta, charge, a) as read from the form
+        self.cache = cache
+        self.signals = CalcSignals()
+
+    def run(self):
+        # The pool runs one job at a time, so from here on the recorder only sees this job
+        prof = EF_profile.active
+        if prof is not None:
+            prof.reset()
+
+        start = perf_counter()
+        try:
+            results = evaluate(DipoleInput(*self.inputs), cache=self.cache)
+        except (ArithmeticError, ValueError) as error:
+            self.signals.failed.emit(self.job_id, str(error) or type(error).__name__)
+        else:
+            summary = prof.summary() if prof is not None else ''
+            self.signals.finished.emit(self.job_id, results, perf_counter() - start, summary)
+
+
 class myForm(QMainWindow):
     '''
     Purpose: Main GUI class to handle all the GUI operations and invoking different functions to calculate results
     '''
-    def __init__(self):
+    def __init__(self, cache=None):
         super().__init__()
+        self.cache = cache   # optional PotentialCache shared by every calculation
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         self.ui.textBrowser.setOpenExternalLinks(True)
@@ -20,7 +63,28 @@ class myForm(QMainWindow):
         self.ui.mdiArea.addSubWindow(self.ui.subwindow)
         self.ui.mdiArea.addSubWindow(self.ui.help_subwindow)
         self.ui.mdiArea.addSubWindow(self.ui.about_subwindow)
+        self.fieldmap_subwindow = FieldMapWindow()
+        self.ui.mdiArea.addSubWindow(self.fieldmap_subwindow)
         self.ui.calculate_pushButton.clicked.connect(self.cal_result)
+
+        # Calculations run on one background thread, only the latest job is shown
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.job_id = 0
+
+        # Live mode recalculates after edits, debounced so only the latest input is computed
+        self.live_checkBox = QCheckBox('Live', self.ui.subwindow)
+        self.live_checkBox.setGeometry(QRect(580, 220, 80, 31))
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_DEBOUNCE_MS)
+        self.live_timer.timeout.connect(self.live_result)
+        for lineEdit in (self.ui.r_lineEdit, self.ui.a_lineEdit, self.ui.theta_lineEdit, self.ui.q_lineEdit):
+            lineEdit.textChanged.connect(self.schedule_live_result)
+        for comboBox in (self.ui.r_comboBox, self.ui.a_comboBox, self.ui.theta_comboBox, self.ui.q_comboBox):
+            comboBox.currentIndexChanged.connect(self.schedule_live_result)
+        self.live_checkBox.toggled.connect(self.schedule_live_result)
+
         self.show()
 
 
@@ -45,7 +109,32 @@ class myForm(QMainWindow):
 
     def results_disp(self):
         '''
-        Purpose: To calculate and results and display results
+        Purpose: To start calculating the results on the background thread, show_results() displays them
+
+        Variables Used:
+                       1. inp = to store the inputs converted to SI units
+                       2. self.job_id = to store the id of the latest job, results of older jobs are ignored
+        '''
+
+        # Dropping queued jobs that have not started yet, they are stale now
+        self.job_id += 1
+        self.pool.clear()
+
+        # The field map follows the dipole of the latest calculation
+        inp = DipoleInput(self.r, self.angle, self.charge, self.a)
+        self.fieldmap_subwindow.view.set_dipole(inp.charge, inp.a)
+
+        # The job converts the inputs again and resets the profiler itself, a job still running now
+        # is stale and whatever it records is never shown
+        job = CalcJob(self.job_id, (self.r, self.angle, self.charge, self.a), self.cache)
+        job.signals.finished.connect(self.show_results)
+        job.signals.failed.connect(self.show_failure)
+        self.pool.start(job)
+        self.ui.statusbar.showMessage('Calculating...')
+
+    def show_results(self, job_id, results, elapsed, summary):
+        '''
+        Purpose: To display results posted by CalcJob
 
         Variables Used:
                        1. DM = to store the value of dipole moment
@@ -53,23 +142,59 @@ class myForm(QMainWindow):
                        3. Approx_Potential = to store the value of approx potential calculated
                        4. Error = to store the error i.e difference of exact potential and approx potential
         '''
+        if job_id != self.job_id:    # A newer calculation was started meanwhile
+            return
 
-        DM = dipole_moment(self.charge, self.a)
-        self.ui.DM_lineEdit.setText(str(DM))
+        DM, Exact_Potential, Approx_Potential, Error = results
 
-        Exact_Potential = dipole(self.r, self.angle, self.charge, self.a)
+        self.ui.DM_lineEdit.setText(str(DM))
         self.ui.EP_lineEdit.setText(str(Exact_Potential))
-
-        Approx_Potential = dipole_approx(self.r, self.angle, self.charge, self.a)
         self.ui.AP_lineEdit.setText(str(Approx_Potential))
-
-        Error = diff(Exact_Potential, Approx_Potential)
         self.ui.Error_lineEdit.setText(str(Error))
+        message = 'Calculated in %.3f ms' % (elapsed * 1000)
+        if summary:
+            message += ' | ' + summary
+        self.ui.statusbar.showMessage(message)
+
+    def show_failure(self, job_id, message):
+        '''
+        Purpose: To display the error of a failed calculation in the status bar
+        '''
+        if job_id == self.job_id:
+            self.ui.statusbar.showMessage('Calculation failed: ' + message)
+
+    def schedule_live_result(self):
+        '''
+        Purpose: To restart the debounce timer after an edit when live mode is on
+        '''
+        if self.live_checkBox.isChecked():
+            self.live_timer.start()
+
+    def live_result(self):
+        '''
+        Purpose: To recalculate for the latest input in live mode, invalid input is reported in the status bar instead of a popup
+        '''
+        invalid_values = self.read_inputs()
+        if len(invalid_values):
+            self.ui.statusbar.showMessage('Invalid Input : ' + ', '.join(invalid_values))
+        else:
+            self.results_disp()
 
     def cal_result(self):
         '''
         Purpose        : To check if all the input parameters are of correct datatypes. If there's any mistake then invoking mistakes_disp()
                         otherwise invoking results_disp()
+        '''
+        invalid_values = self.read_inputs()
+
+        if len(invalid_values):  # If there are some invalid values received
+            self.mistakes_disp(invalid_values)
+        else:                    # If there's no invalid value received
+            self.results_disp()
+
+    def read_inputs(self):
+        '''
+        Purpose        : To read all the input parameters from the form and collect the invalid ones
 
         Varaibles Used :
                         1. self.r = to store the distance between center of dipole and the point of observation along with it's unit
@@ -77,6 +202,8 @@ class myForm(QMainWindow):
                         3. self.angle = to store the angle between point of observation, positive charge and center of dipole along with it's unit
                         4. self.charge = to store the value of charge along with it's unit
                         5. invalid values = to store the names of the attributes with invalid values received
+
+        Return         : returns list of the names of the attributes with invalid values
         '''
 
         invalid_values = list() # Initially, there are no invalid parameters
@@ -119,16 +246,14 @@ class myForm(QMainWindow):
         except ValueError:
             invalid_values.append('Charge')
 
-
-        if len(invalid_values):  # If there are some invalid values received
-            self.mistakes_disp(invalid_values)
-        else:                    # If there's no invalid value received
-            self.results_disp()
+        return invalid_values
 
 
 # Executing our application
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    w = myForm()
+    if '--profile' in sys.argv:    # showing per-stage timings in the status bar
+        EF_profile.enable()
+    w = myForm(cache=PotentialCache(maxsize=1024))
     w.show()
     sys.exit(app.exec_())
\ No newline at end of file
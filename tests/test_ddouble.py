@@ -0,0 +1,34 @@
+import numpy as np
+from mpmath import mp
+
+from EF_ddouble import dipole_dd_batch, to_mpf
+from EF_of_dipole import potential_mp
+
+# * Same limit as benchmarks/bench_ddouble.py
+DD_ACCURACY_LIMIT = 1e-29
+
+
+def test_double_double_against_mpmath():
+    rng = np.random.default_rng(0)
+    n = 500
+    r = rng.uniform(1e-3, 10.0, n)
+    theta = rng.uniform(0, np.pi, n)
+    charge = rng.uniform(1e-9, 1e-6, n)
+    a = 10 ** rng.uniform(-20, -2, n)
+    cos_theta = np.round(np.cos(theta), 5)
+
+    hi, lo = dipole_dd_batch(r, theta, charge, a)
+    with mp.workdps(100):
+        error = max(abs(to_mpf((hi[i], lo[i])) / potential_mp(r[i], cos_theta[i], charge[i], a[i]) - 1)
+                    for i in range(n))
+    assert error <= DD_ACCURACY_LIMIT
+
+
+def test_double_double_next_to_a_charge():
+    a = 1e-3
+    r = np.array([a * (1 + 1e-12), a * (1 - 1e-12)])
+    hi, lo = dipole_dd_batch(r, 0.0, 1e-9, a)
+    with mp.workdps(100):
+        for i in range(len(r)):
+            reference = potential_mp(r[i], 1.0, 1e-9, a)
+            assert abs(to_mpf((hi[i], lo[i])) / reference - 1) <= DD_ACCURACY_LIMIT
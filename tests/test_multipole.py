@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from EF_batch import dipole_exact_batch
+from EF_multipole import choose_order, multipole_potential
+
+
+@pytest.mark.parametrize('order', [None, 1, 3, 15])
+def test_rho_one_uses_closed_form(order):
+    # r == a, where the series does not converge
+    value, used = multipole_potential(1.0, 0.5, 1e-9, 1.0, order=order)
+    assert used == 0
+    assert value == pytest.approx(dipole_exact_batch(1.0, 0.5, 1e-9, 1.0), rel=1e-14)
+    assert value == pytest.approx(13.5256, rel=1e-5)
+
+
+def test_choose_order_rejects_rho_one():
+    assert choose_order(np.array([1.0]), np.array([0.5]), 1e-12)[0] > choose_order(np.array([0.1]),
+                                                                                    np.array([0.5]), 1e-12)[0]
+
+
+def test_series_matches_closed_form():
+    r = np.array([0.5, 2.0, 10.0, 1e3])
+    theta = np.array([0.1, 1.0, 2.0, 3.0])
+    values, orders = multipole_potential(r, theta, 1e-9, 1.0)
+    assert values == pytest.approx(dipole_exact_batch(r, theta, 1e-9, 1.0), rel=1e-11)
+    assert (orders[[0, 2, 3]] > 0).all()
@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+from mpmath import mp
+
+from EF_store import ResultStore, precision_key
+
+ROWS = [(1.0, 0.5, 1e-9, 1e-3), (1.0, -0.5, 1e-9, 1e-3), (2.0, 0.5, -1e-9, 1e-3), (3.0, 0.0, 1e-9, 1e-3)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('precision', [precision_key(dps=60), precision_key(rtol=1e-40)])
+def test_round_trip_keeps_sign_and_digits(store, precision):
+    with mp.workdps(60):
+        values = [mp.mpf(1) / 3, -mp.mpf(2) / 7, -mp.pi * 1e-20, mp.mpf(0)]
+        store.put_many(ROWS, values, precision)
+    with mp.workdps(15):
+        stored = store.get_many(ROWS, precision)
+    assert [value._mpf_ for value in stored] == [value._mpf_ for value in values]
+
+
+def test_non_finite_values(store):
+    store.put_many(ROWS[:2], [mp.inf, -mp.inf], 'dps=15')
+    assert store.get_many(ROWS[:2], 'dps=15') == [mp.inf, -mp.inf]
+
+
+def test_missing_rows_and_other_precision(store):
+    store.put_many(ROWS[:1], [mp.mpf(-1)], 'dps=15')
+    assert store.get_many(ROWS[:2], 'dps=15') == [mp.mpf(-1), None]
+    assert store.get_many(ROWS[:1], 'dps=30') == [None]
+
+
+def test_pickled_store_reads_same_file(store):
+    store.put_many(ROWS[:1], [mp.mpf(-0.25)], 'dps=15')
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.get_many(ROWS[:1], 'dps=15') == [mp.mpf(-0.25)]
+    copy.close()